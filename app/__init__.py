@@ -3,22 +3,26 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 
 from app.config import Config
+from app.utils.replica import RoutingSession, configure_replica
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models.user import User
-    return db.session.get(User, int(user_id))
+    from app.utils.identity import load_identity
+    return load_identity(int(user_id))
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    configure_replica(app)
     db.init_app(app)
+    from app.utils.sqlite import configure_sqlite
+    configure_sqlite(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Please log in to access this page."
@@ -46,11 +50,48 @@ def create_app(config_class=Config):
     app.register_error_handler(403, forbidden)
     app.register_error_handler(500, server_error)
 
+    from app.utils.password_pool import init_password_pool
+    init_password_pool(app)
+
+    from app.utils.versions import track_table_writes
+    track_table_writes()
+
+    from app.utils.jobs import init_job_runner
+    init_job_runner(app)
+
+    if app.config.get("SQL_INSTRUMENTATION"):
+        from app.instrumentation import init_instrumentation
+        init_instrumentation(app)
+
+    from app.cli import register_cli
+    register_cli(app)
+
+    return app
+
+
+def init_db(app):
+    """Create missing tables and the default super admin. Run by `flask init-db`,
+    never at app construction, so worker boot does no database I/O."""
     with app.app_context():
         # IMPORTANT: don't use `import app.models` here, it would overwrite the local
         # Flask app variable named `app` with the `app` python package/module.
         from app import models  # noqa: F401 - register all models and tables
-        db.create_all()
+        from sqlalchemy import inspect
+        from sqlalchemy.schema import CreateIndex
+        new_ledger = not inspect(db.engine).has_table("fee_ledger")
+        db.create_all(bind_key=None)  # not the read-only replica bind
+        # create_all skips tables that exist, so add indexes declared since.
+        # IF NOT EXISTS rather than checkfirst, which can't see expression indexes
+        with db.engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+        if new_ledger:
+            # Upgrading a database that already has payments
+            from app.services.fees import rebuild_fee_ledger
+            rebuild_fee_ledger()
+        from app.services.student_search import ensure_search_index
+        ensure_search_index()
         from app.models.user import User
         if User.query.count() == 0:
             admin = User(
@@ -58,8 +99,8 @@ def create_app(config_class=Config):
                 email="admin@school.local",
                 role="super_admin",
             )
-            admin.set_password("admin123")
+            admin.set_password("admin123", app.config["PASSWORD_HASH_METHOD"])
             db.session.add(admin)
             db.session.commit()
-
-    return app
+            return True
+    return False
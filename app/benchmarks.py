@@ -0,0 +1,202 @@
+# Bundled benchmarks, run through the `flask bench` commands in app.cli. They
+# work on throwaway databases under a temp directory, never instance/school.db.
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app.config import config_by_name
+
+BENCH_STUDENTS = 60
+# Background history so the report readers do real scans while writers commit
+HISTORY_STUDENTS = 1000
+HISTORY_DAYS = 120
+
+
+def _bench_config(profile, uri):
+    return type("BenchConfig", (config_by_name[profile],), {
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "CACHE_VERSION_DIR": os.path.join(os.path.dirname(uri[len("sqlite:///"):]), "versions"),
+        "SQL_INSTRUMENTATION": False,
+        # Readers must hit the database, not the report cache
+        "REPORT_CACHE_SIZE": 0,
+    })
+
+
+def _seed(profile, uri):
+    from app import create_app, db, init_db
+    from app.models import SchoolClass, Student, StudentAttendance
+
+    app = create_app(_bench_config(profile, uri))
+    init_db(app)
+    with app.app_context():
+        c = SchoolClass(name="Bench")
+        db.session.add(c)
+        db.session.flush()
+        db.session.add_all([
+            Student(admission_no=f"B{i:04d}", first_name="Bench", last_name=str(i), class_id=c.id)
+            for i in range(BENCH_STUDENTS)
+        ])
+        history = SchoolClass(name="History")
+        db.session.add(history)
+        db.session.flush()
+        db.session.add_all([
+            Student(admission_no=f"H{i:05d}", first_name="History", last_name=str(i), class_id=history.id)
+            for i in range(HISTORY_STUDENTS)
+        ])
+        db.session.flush()
+        ids = [sid for (sid,) in db.session.query(Student.id).filter(Student.class_id == history.id)]
+        start = date(2023, 1, 2)
+        db.session.execute(StudentAttendance.__table__.insert(), [
+            {"student_id": sid, "date": start + timedelta(days=d), "status": "present"}
+            for d in range(HISTORY_DAYS) for sid in ids
+        ])
+        db.session.commit()
+
+
+def _attendance_writer(profile, uri, seconds, seed, results):
+    # One "teacher" submitting a full class register over and over
+    from sqlalchemy.exc import OperationalError
+
+    from app import create_app, db
+    from app.models import Student
+    from app.services.attendance import save_student_attendance
+
+    app = create_app(_bench_config(profile, uri))
+    rng = random.Random(seed)
+    ok = locked = 0
+    with app.app_context():
+        ids = [sid for (sid,) in db.session.query(Student.id)]
+        db.session.rollback()
+    # Inside a POST, as the attendance form submits it
+    with app.test_request_context("/students/attendance", method="POST"):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            day = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+            entries = {sid: (rng.choice(("present", "absent", "late")), None) for sid in ids}
+            try:
+                save_student_attendance(day, entries)
+                db.session.commit()
+                ok += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                locked += 1
+    results.put((ok, locked))
+
+
+def _report_reader(profile, uri, seconds, results):
+    # An admin re-running the raw whole-school attendance report
+    from sqlalchemy.exc import OperationalError
+
+    from app import create_app, db
+    from app.services.reports import attendance_report_students
+
+    app = create_app(_bench_config(profile, uri))
+    reads = locked = 0
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                attendance_report_students(start_date=date(2023, 1, 1), end_date=date(2024, 12, 31), use_rollups=False)
+                db.session.rollback()
+                reads += 1
+            except OperationalError:
+                db.session.rollback()
+                locked += 1
+    results.put((reads, locked))
+
+
+def sqlite_concurrency(profiles=("default", "production"), workers=8, readers=2, seconds=5.0):
+    """Concurrent class-attendance submissions, alongside report readers, per config profile.
+
+    Returns {profile: {"submissions", "lock_errors", "per_second", "error_rate", "reports"}}.
+    """
+    from app.config import INSTANCE_DIR
+
+    ctx = multiprocessing.get_context("spawn")
+    report = {}
+    # Under instance/ so fsync costs match the real database's disk
+    with tempfile.TemporaryDirectory(dir=INSTANCE_DIR, prefix="bench-") as tmp:
+        for profile in profiles:
+            uri = f"sqlite:///{os.path.join(tmp, profile + '.db')}"
+            _seed(profile, uri)
+            writes, reads = ctx.Queue(), ctx.Queue()
+            procs = [
+                ctx.Process(target=_attendance_writer, args=(profile, uri, seconds, i, writes))
+                for i in range(workers)
+            ] + [
+                ctx.Process(target=_report_reader, args=(profile, uri, seconds, reads))
+                for _ in range(readers)
+            ]
+            for p in procs:
+                p.start()
+            write_totals = [writes.get() for _ in range(workers)]
+            read_totals = [reads.get() for _ in range(readers)]
+            for p in procs:
+                p.join()
+            ok = sum(t[0] for t in write_totals)
+            locked = sum(t[1] for t in write_totals) + sum(t[1] for t in read_totals)
+            attempts = ok + locked
+            report[profile] = {
+                "submissions": ok,
+                "lock_errors": locked,
+                "per_second": round(ok / seconds, 1),
+                "error_rate": round(locked / attempts, 4) if attempts else 0.0,
+                "reports": sum(t[0] for t in read_totals),
+            }
+    return report
+
+
+# Runs in a fresh interpreter; prints timings as JSON
+_BOOT_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+for _ in range(5):
+    create_app()
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create": t2 - t1, "warm": (t3 - t2) / 5}))
+"""
+
+
+def boot_time(runs=5):
+    """Median import and create_app() time over ``runs`` fresh interpreters.
+
+    Points DATABASE_URL at a file that does not exist, so ``db_touched`` shows
+    whether app construction opened the database.
+    """
+    from app.config import BASE_DIR
+
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="boot-") as tmp:
+        db_file = os.path.join(tmp, "boot.db")
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{db_file}",
+            CACHE_VERSION_DIR=os.path.join(tmp, "versions"),
+            REPORT_JOB_DIR=os.path.join(tmp, "jobs"),
+        )
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, "-c", _BOOT_SCRIPT], cwd=BASE_DIR, env=env,
+                capture_output=True, text=True, check=True,
+            ).stdout
+            samples.append(json.loads(out.strip().splitlines()[-1]))
+        touched = os.path.exists(db_file)
+    return {
+        "import_ms": statistics.median(s["import"] for s in samples) * 1000,
+        "create_app_ms": statistics.median(s["create"] for s in samples) * 1000,
+        "create_app_warm_ms": statistics.median(s["warm"] for s in samples) * 1000,
+        "db_touched": touched,
+    }
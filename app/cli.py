@@ -0,0 +1,142 @@
+# Maintenance commands, registered on the app in create_app
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create missing database tables and the default admin user."""
+    from app import init_db
+    if init_db(current_app._get_current_object()):
+        click.echo("Created default admin user (admin / admin123).")
+    click.echo("Database ready.")
+
+
+rollups_cli = AppGroup("rollups", help="Attendance rollup maintenance.")
+
+
+@rollups_cli.command("rebuild")
+def rollups_rebuild():
+    """Rebuild attendance rollups from the raw attendance rows."""
+    from app.services.attendance import rebuild_attendance_rollups
+    for table, count in rebuild_attendance_rollups().items():
+        click.echo(f"{table}: {count} rows")
+
+
+@rollups_cli.command("verify")
+@click.option("--limit", default=20, show_default=True, help="Max drifted rows to print.")
+def rollups_verify(limit):
+    """Report rollup rows that disagree with the raw attendance rows."""
+    from app.services.attendance import verify_attendance_rollups
+    drift = verify_attendance_rollups()
+    for table, key, stored, expected in drift[:limit]:
+        click.echo(f"{table} {key}: stored={stored} expected={expected}")
+    if drift:
+        click.echo(f"{len(drift)} drifted row(s). Run `flask rollups rebuild` to fix.")
+        raise SystemExit(1)
+    click.echo("Rollups match attendance rows.")
+
+
+students_cli = AppGroup("students", help="Student records.")
+
+
+@students_cli.command("import")
+@click.argument("csv_file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--errors", "errors_file", type=click.File("w"), help="Write rejected rows to this CSV file.")
+@click.option("--dry-run", is_flag=True, help="Validate only; insert nothing.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per transaction.")
+def students_import(csv_file, errors_file, dry_run, batch_size):
+    """Bulk-admit students from a CSV file (same columns as the web import)."""
+    import csv
+    from app.services.student_import import ImportFileError, import_students
+
+    writer = None
+    if errors_file:
+        writer = csv.writer(errors_file)
+        writer.writerow(["line", "admission_no", "error"])
+
+    def on_error(line, admission_no, message):
+        if writer:
+            writer.writerow([line, admission_no, message])
+        else:
+            click.echo(f"line {line} ({admission_no}): {message}", err=True)
+
+    try:
+        result = import_students(csv_file, on_error, dry_run=dry_run, batch_size=batch_size)
+    except ImportFileError as e:
+        raise click.ClickException(str(e))
+    verb = "would be imported" if dry_run else "imported"
+    click.echo(f"{result['rows']} rows: {result['inserted']} {verb}, {result['failed']} rejected.")
+    if result["failed"]:
+        raise SystemExit(1)
+
+
+@students_cli.command("reindex")
+def students_reindex():
+    """Rebuild the student search index from the student table."""
+    from app import db
+    from app.services.student_search import ensure_search_index, rebuild_search_index
+    if not ensure_search_index():
+        rebuild_search_index()
+        db.session.commit()
+    click.echo("Student search index rebuilt.")
+
+
+fees_cli = AppGroup("fees", help="Fee ledger maintenance.")
+
+
+@fees_cli.command("reconcile")
+@click.option("--check", is_flag=True, help="Only report drift; exit 1 if any.")
+@click.option("--limit", default=20, show_default=True, help="Max drifted rows to print.")
+def fees_reconcile(check, limit):
+    """Compare the fee ledger with the payments and rebuild it from them."""
+    from app.services.fees import rebuild_fee_ledger, verify_fee_ledger
+    drift = verify_fee_ledger()
+    for (student_id, fee_structure_id), stored, expected in drift[:limit]:
+        click.echo(f"student {student_id} structure {fee_structure_id}: stored={stored} expected={expected}")
+    click.echo(f"{len(drift)} drifted row(s).")
+    if check:
+        if drift:
+            raise SystemExit(1)
+        return
+    click.echo(f"Fee ledger rebuilt: {rebuild_fee_ledger()} rows.")
+
+
+bench_cli = AppGroup("bench", help="Bundled performance benchmarks (temporary databases).")
+
+
+@bench_cli.command("sqlite")
+@click.option("--workers", default=8, show_default=True, help="Concurrent writer processes.")
+@click.option("--readers", default=2, show_default=True, help="Concurrent report reader processes.")
+@click.option("--seconds", default=5.0, show_default=True, help="Duration per profile.")
+def bench_sqlite(workers, readers, seconds):
+    """Attendance write throughput and lock errors: default vs production SQLite profile."""
+    from app.benchmarks import sqlite_concurrency
+    for profile, r in sqlite_concurrency(workers=workers, readers=readers, seconds=seconds).items():
+        click.echo(
+            f"{profile:<11} {r['per_second']:>8} submissions/s  "
+            f"{r['lock_errors']:>5} lock errors ({r['error_rate']:.2%})  "
+            f"{r['reports']:>5} reports"
+        )
+
+
+@bench_cli.command("boot")
+@click.option("--runs", default=5, show_default=True, help="Fresh interpreters to time.")
+def bench_boot(runs):
+    """Worker cold start: package import plus create_app(), in fresh interpreters."""
+    from app.benchmarks import boot_time
+    r = boot_time(runs=runs)
+    click.echo(f"import      {r['import_ms']:>8.1f} ms (median of {runs})")
+    click.echo(f"create_app  {r['create_app_ms']:>8.1f} ms (first call)")
+    click.echo(f"create_app  {r['create_app_warm_ms']:>8.1f} ms (later calls)")
+    click.echo(f"database touched: {'yes' if r['db_touched'] else 'no'}")
+
+
+def register_cli(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(students_cli)
+    app.cli.add_command(fees_cli)
+    app.cli.add_command(bench_cli)
@@ -12,4 +12,75 @@ class Config:
         "DATABASE_URL"
     ) or f"sqlite:///{INSTANCE_DIR / 'school.db'}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Version files that invalidate process-local caches across workers
+    CACHE_VERSION_DIR = os.environ.get("CACHE_VERSION_DIR") or str(INSTANCE_DIR / "cache_versions")
+    # current_user identity cache (seconds / entries)
+    IDENTITY_CACHE_TTL = 300
+    IDENTITY_CACHE_SIZE = 4096
+    # Password hashing: current method/cost, and the bounded verification pool
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD") or "scrypt:32768:8:1"
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 8))
     WTF_CSRF_ENABLED = True
+    # Rows per page on list views (override per request with ?per_page=)
+    LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", 50))
+    LIST_PAGE_SIZE_MAX = 500
+    # Raise QueryBudgetExceeded when a @query_budget view runs too many queries
+    QUERY_BUDGETS_ENFORCED = False
+    # Per-request SQL counters, Server-Timing header and /admin/metrics
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "1") != "0"
+    SQL_METRICS_WINDOW = 1000  # requests kept per endpoint
+    # PRAGMAs run on every new SQLite connection (see ProductionConfig)
+    SQLITE_PRAGMAS = {}
+    # Start transactions in writing requests with BEGIN IMMEDIATE (SQLite only)
+    SQLITE_IMMEDIATE_WRITES = False
+    # Read replica for @read_only views: "" (off), "snapshot", "readonly" or a
+    # database URL; see app/utils/replica.py
+    READ_REPLICA = os.environ.get("READ_REPLICA", "")
+    READ_REPLICA_MAX_LAG = float(os.environ.get("READ_REPLICA_MAX_LAG", 30))  # seconds
+    READ_REPLICA_SNAPSHOT = os.environ.get("READ_REPLICA_SNAPSHOT")  # default: <db>.replica
+    # Background report jobs: results kept under REPORT_JOB_DIR for REPORT_JOB_RETENTION seconds
+    REPORT_JOB_DIR = os.environ.get("REPORT_JOB_DIR") or str(INSTANCE_DIR / "report_jobs")
+    REPORT_JOB_WORKERS = int(os.environ.get("REPORT_JOB_WORKERS", 2))
+    REPORT_JOB_RETENTION = 24 * 3600
+    # Report results cached per process (entries; 0 disables)
+    REPORT_CACHE_SIZE = int(os.environ.get("REPORT_CACHE_SIZE", 256))
+    # Exam statistics: pass mark as a percentage of max_marks
+    EXAM_PASS_PERCENT = float(os.environ.get("EXAM_PASS_PERCENT", 40))
+
+
+class ProductionConfig(Config):
+    """SQLite tuned for several gunicorn workers writing at once.
+
+    WAL lets readers run alongside the single writer, busy_timeout makes writers
+    wait for the lock instead of failing with "database is locked", and
+    synchronous=NORMAL is durable in WAL mode except for the last commits
+    before a power loss. Writing requests take the write lock when their
+    transaction begins (BEGIN IMMEDIATE), where busy_timeout can wait for it;
+    a deferred transaction that has already read fails at once with
+    SQLITE_BUSY if another writer commits first.
+    """
+
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 15000,  # ms
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB
+        "temp_store": "MEMORY",
+    }
+    SQLITE_IMMEDIATE_WRITES = True
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 5)),
+        "pool_timeout": 10,
+        "pool_pre_ping": False,
+        # Same wait at the driver level, for the BEGIN that takes the write lock
+        "connect_args": {"timeout": 15},
+    }
+
+
+config_by_name = {
+    "default": Config,
+    "production": ProductionConfig,
+}
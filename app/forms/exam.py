@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, DateField, SelectField, DecimalField, TextAreaField
 from wtforms.validators import DataRequired, Optional, NumberRange
 
@@ -20,3 +21,16 @@ class ExamForm(FlaskForm):
     subject_id = SelectField("Subject", coerce=coerce_int_or_none, validators=[DataRequired()])
     max_marks = DecimalField("Max Marks", places=2, validators=[DataRequired(), NumberRange(min=0)], default=100)
     exam_date = DateField("Exam Date", validators=[Optional()], format="%Y-%m-%d")
+
+
+class ExamResultsForm(FlaskForm):
+    # Per-student marks_<id>/grade_<id>/remarks_<id> inputs are read from request.form;
+    # this form only carries the CSRF token
+    pass
+
+
+class ExamResultUploadForm(FlaskForm):
+    results_file = FileField(
+        "Results File",
+        validators=[FileRequired(), FileAllowed(["csv", "tsv", "txt"], "CSV or TSV files only.")],
+    )
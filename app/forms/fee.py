@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, DateField, SelectField, DecimalField
-from wtforms.validators import DataRequired, Optional, NumberRange
+from wtforms.validators import DataRequired, Optional, NumberRange, ValidationError
 
 
 def coerce_int_or_none(x):
@@ -9,6 +9,32 @@ def coerce_int_or_none(x):
     return int(x)
 
 
+class LookupSelectField(SelectField):
+    """A select whose options the browser fetches from a JSON endpoint. The server
+    never builds the option list: set ``lookup`` (id -> label, or None if there is
+    no such id) per request and only the submitted id is checked and rendered."""
+
+    def __init__(self, label=None, validators=None, **kwargs):
+        super().__init__(label, validators, coerce=coerce_int_or_none, choices=[("", "")], **kwargs)
+        self.lookup = None
+        self._labels = {}
+
+    def _label(self, value):
+        if value not in self._labels:
+            self._labels[value] = self.lookup(value)
+        return self._labels[value]
+
+    def iter_choices(self):
+        choices = [("", "")]
+        if self.data is not None and self._label(self.data) is not None:
+            choices.append((self.data, self._label(self.data)))
+        return self._choices_generator(choices)
+
+    def pre_validate(self, form):
+        if self.data is not None and self._label(self.data) is None:
+            raise ValidationError(self.gettext("Not a valid choice."))
+
+
 class FeeStructureForm(FlaskForm):
     class_id = SelectField("Class", coerce=coerce_int_or_none, validators=[DataRequired()])
     fee_type = StringField("Fee Type", validators=[DataRequired()], description="e.g. tuition, transport")
@@ -18,8 +44,8 @@ class FeeStructureForm(FlaskForm):
 
 
 class FeePaymentForm(FlaskForm):
-    student_id = SelectField("Student", coerce=coerce_int_or_none, validators=[DataRequired()])
-    fee_structure_id = SelectField("Fee Structure", coerce=coerce_int_or_none, validators=[DataRequired()])
+    student_id = LookupSelectField("Student", validators=[DataRequired()])
+    fee_structure_id = LookupSelectField("Fee Structure", validators=[DataRequired()])
     amount_paid = DecimalField("Amount Paid", places=2, validators=[DataRequired(), NumberRange(min=0)])
     payment_date = DateField("Payment Date", validators=[DataRequired()], format="%Y-%m-%d")
     receipt_no = StringField("Receipt No", validators=[Optional()])
@@ -1,5 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, DateField, SelectField, TextAreaField
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import BooleanField, StringField, DateField, SelectField, TextAreaField
 from wtforms.validators import DataRequired, Optional
 
 
@@ -25,3 +26,8 @@ class StudentForm(FlaskForm):
     guardian_contact = StringField("Guardian Contact", validators=[Optional()])
     address = TextAreaField("Address", validators=[Optional()])
     admission_date = DateField("Admission Date", validators=[Optional()], format="%Y-%m-%d")
+
+
+class StudentImportForm(FlaskForm):
+    csv_file = FileField("CSV File", validators=[FileRequired(), FileAllowed(["csv"], "CSV files only.")])
+    dry_run = BooleanField("Validate only (don't save)")
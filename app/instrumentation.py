@@ -0,0 +1,152 @@
+# Per-request SQL instrumentation: statement count, DB time and slowest
+# statement, reported as a Server-Timing header and kept as rolling
+# per-endpoint samples for the admin metrics route.
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_current = ContextVar("sql_request_stats", default=None)
+_listening = False
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "slowest", "slowest_sql")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, not the connection, so a statement that
+    # raises (and never reaches after_cursor_execute) leaves nothing behind
+    if _current.get() is not None and context is not None:
+        context._sql_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = getattr(context, "_sql_stats_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.queries += 1
+    stats.db_time += elapsed
+    if elapsed > stats.slowest:
+        stats.slowest = elapsed
+        stats.slowest_sql = statement
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _histogram(values):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for v in values:
+        counts[bisect_left(HISTOGRAM_BUCKETS_MS, v)] += 1
+    # A list rather than a dict so bucket order survives JSON key sorting
+    bounds = list(HISTOGRAM_BUCKETS_MS) + [None]
+    return [{"le_ms": bound, "count": c} for bound, c in zip(bounds, counts)]
+
+
+class EndpointMetrics:
+    """Rolling window of the last ``window`` requests for each endpoint."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._slowest = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, total_ms, stats):
+        sample = (total_ms, stats.db_time * 1000, stats.queries)
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(sample)
+            slow_ms = stats.slowest * 1000
+            if stats.slowest_sql and slow_ms > self._slowest.get(endpoint, (0, None))[0]:
+                self._slowest[endpoint] = (slow_ms, stats.slowest_sql[:500])
+
+    def snapshot(self):
+        with self._lock:
+            samples = {k: list(v) for k, v in self._samples.items()}
+            slowest = dict(self._slowest)
+        out = {}
+        for endpoint, rows in sorted(samples.items()):
+            totals = sorted(r[0] for r in rows)
+            db_times = sorted(r[1] for r in rows)
+            queries = [r[2] for r in rows]
+            slow_ms, slow_sql = slowest.get(endpoint, (0, None))
+            out[endpoint] = {
+                "requests": len(rows),
+                "duration_ms": {
+                    "p50": _percentile(totals, 50),
+                    "p95": _percentile(totals, 95),
+                    "p99": _percentile(totals, 99),
+                    "max": totals[-1],
+                    "histogram": _histogram(totals),
+                },
+                "db_ms": {
+                    "p50": _percentile(db_times, 50),
+                    "p95": _percentile(db_times, 95),
+                    "max": db_times[-1],
+                },
+                "queries": {"mean": sum(queries) / len(queries), "max": max(queries)},
+                "slowest_statement": {"ms": slow_ms, "sql": slow_sql},
+            }
+        return out
+
+
+def init_instrumentation(app):
+    global _listening
+    if not _listening:
+        # Listen on the Engine class so every bind (including ones created later) is covered
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listening = True
+    metrics = EndpointMetrics(window=app.config.get("SQL_METRICS_WINDOW", 1000))
+    app.extensions["sql_metrics"] = metrics
+
+    @app.before_request
+    def _start_request_stats():
+        g._sql_stats_token = _current.set(RequestStats())
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _server_timing(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - g._request_started) * 1000
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+            f"db-slowest;dur={stats.slowest * 1000:.2f}, "
+            f"app;dur={total_ms:.2f}",
+        )
+        metrics.record(request.endpoint or "unknown", total_ms, stats)
+        return response
+
+    @app.teardown_request
+    def _end_request_stats(exc):
+        token = g.pop("_sql_stats_token", None)
+        if token is not None:
+            _current.reset(token)
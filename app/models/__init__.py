@@ -7,7 +7,8 @@ from app.models.student_attendance import StudentAttendance
 from app.models.exam import Exam, ExamResult
 from app.models.conduct_certificate import ConductCertificate
 from app.models.teacher_attendance import TeacherAttendance
-from app.models.fee import FeeStructure, FeePayment
+from app.models.fee import FeeStructure, FeePayment, FeeLedger
+from app.models.attendance_rollup import ClassAttendanceDaily, StudentAttendanceMonthly, TeacherAttendanceMonthly
 
 __all__ = [
     "User",
@@ -22,6 +23,10 @@ __all__ = [
     "TeacherAttendance",
     "FeeStructure",
     "FeePayment",
+    "FeeLedger",
+    "ClassAttendanceDaily",
+    "StudentAttendanceMonthly",
+    "TeacherAttendanceMonthly",
     "teacher_subject",
     "class_subject",
 ]
@@ -0,0 +1,51 @@
+from app import db
+
+
+# Counter tables kept in step with StudentAttendance / TeacherAttendance writes
+# by app.services.attendance; rebuilt from the raw rows with `flask rollups rebuild`.
+class ClassAttendanceDaily(db.Model):
+    __tablename__ = "class_attendance_daily"
+
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey("school_class.id"), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("class_id", "date", name="uq_class_attendance_daily_class_date"),
+    )
+
+
+class StudentAttendanceMonthly(db.Model):
+    __tablename__ = "student_attendance_monthly"
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("student.id"), nullable=False)
+    month = db.Column(db.Date, nullable=False, index=True)  # first day of the month
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "month", name="uq_student_attendance_monthly_student_month"),
+    )
+
+
+class TeacherAttendanceMonthly(db.Model):
+    __tablename__ = "teacher_attendance_monthly"
+
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey("teacher.id"), nullable=False)
+    month = db.Column(db.Date, nullable=False, index=True)  # first day of the month
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("teacher_id", "month", name="uq_teacher_attendance_monthly_teacher_month"),
+    )
@@ -1,8 +1,17 @@
 from datetime import date
 
+from sqlalchemy import func, literal_column
+
 from app import db
 
 
+def exam_list_date(exam_date):
+    """exam_date with undated exams sorting last in descending order, as the
+    exam list pages it. The fallback is a literal, not a bound parameter, so
+    queries match the ix_exam_list_order expression index."""
+    return func.coalesce(exam_date, literal_column(f"'{date.min.isoformat()}'", db.Date))
+
+
 class Exam(db.Model):
     __tablename__ = "exam"
 
@@ -18,6 +27,10 @@ class Exam(db.Model):
     subject = db.relationship("Subject", backref=db.backref("exams", lazy="dynamic"))
     results = db.relationship("ExamResult", back_populates="exam", lazy="dynamic", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index("ix_exam_list_order", exam_list_date(exam_date).desc(), name, id),
+    )
+
 
 class ExamResult(db.Model):
     __tablename__ = "exam_result"
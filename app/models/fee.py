@@ -30,3 +30,21 @@ class FeePayment(db.Model):
 
     student = db.relationship("Student", backref=db.backref("fee_payments", lazy="dynamic"))
     fee_structure = db.relationship("FeeStructure", back_populates="payments")
+
+
+# Per-student running totals against each fee structure, kept in step with
+# FeePayment writes by app.services.fees; rebuilt with `flask fees reconcile`.
+# A student without a row for a structure has paid nothing towards it.
+class FeeLedger(db.Model):
+    __tablename__ = "fee_ledger"
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("student.id"), nullable=False)
+    fee_structure_id = db.Column(db.Integer, db.ForeignKey("fee_structure.id"), nullable=False, index=True)
+    amount_due = db.Column(db.Numeric(12, 2), nullable=False)
+    amount_paid = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    balance = db.Column(db.Numeric(12, 2), nullable=False)  # amount_due - amount_paid
+
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "fee_structure_id", name="uq_fee_ledger_student_structure"),
+    )
@@ -12,7 +12,7 @@ class Student(db.Model):
     last_name = db.Column(db.String(80), nullable=False)
     dob = db.Column(db.Date, nullable=True)
     gender = db.Column(db.String(20), nullable=True)  # male, female, other
-    class_id = db.Column(db.Integer, db.ForeignKey("school_class.id"), nullable=True)
+    class_id = db.Column(db.Integer, db.ForeignKey("school_class.id"), nullable=True, index=True)
     section = db.Column(db.String(20), nullable=True)
     guardian_name = db.Column(db.String(120), nullable=True)
     guardian_contact = db.Column(db.String(40), nullable=True)
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 
 from app import db
@@ -6,7 +6,12 @@ from app.models import User, SchoolClass, Subject
 from app.forms.user import UserForm
 from app.forms.school_class import SchoolClassForm
 from app.forms.subject import SubjectForm
+from app.services import reference_data
+from app.services.reports import report_cache
 from app.utils.permissions import admin_required
+from app.utils.identity import invalidate_identities
+from app.utils.pagination import keyset_paginate
+from app.utils.replica import read_only
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -21,12 +26,13 @@ def dashboard():
 @admin_bp.route("/users")
 @login_required
 @admin_required
+@read_only
 def user_list():
     role_filter = request.args.get("role")
     q = User.query
     if role_filter:
         q = q.filter_by(role=role_filter)
-    users = q.order_by(User.username).all()
+    users = keyset_paginate(q, [(User.username, False), (User.id, False)])
     return render_template("admin/user_list.html", users=users, role_filter=role_filter)
 
 
@@ -48,7 +54,7 @@ def user_create():
             role=form.role.data,
             linked_id=form.linked_id.data or None,
         )
-        user.set_password(form.password.data or "changeme")
+        user.set_password(form.password.data or "changeme", current_app.config["PASSWORD_HASH_METHOD"])
         db.session.add(user)
         db.session.commit()
         flash("User created.", "success")
@@ -88,8 +94,9 @@ def user_edit(user_id):
         user.role = form.role.data
         user.linked_id = form.linked_id.data or None
         if form.password.data:
-            user.set_password(form.password.data)
+            user.set_password(form.password.data, current_app.config["PASSWORD_HASH_METHOD"])
         db.session.commit()
+        invalidate_identities()
         flash("User updated.", "success")
         return redirect(url_for("admin.user_list"))
     form.linked_id.data = user.linked_id
@@ -106,6 +113,7 @@ def user_deactivate(user_id):
         return redirect(url_for("admin.user_list"))
     user.is_active = False
     db.session.commit()
+    invalidate_identities()
     flash("User deactivated.", "success")
     return redirect(url_for("admin.user_list"))
 
@@ -117,16 +125,30 @@ def user_activate(user_id):
     user = User.query.get_or_404(user_id)
     user.is_active = True
     db.session.commit()
+    invalidate_identities()
     flash("User activated.", "success")
     return redirect(url_for("admin.user_list"))
 
 
+@admin_bp.route("/metrics")
+@login_required
+@admin_required
+def metrics():
+    sql_metrics = current_app.extensions.get("sql_metrics")
+    return jsonify({
+        "endpoints": sql_metrics.snapshot() if sql_metrics else {},
+        "password_verification": current_app.extensions["password_pool"].stats(),
+        "report_cache": report_cache.stats(),
+    })
+
+
 # Classes
 @admin_bp.route("/classes")
 @login_required
 @admin_required
+@read_only
 def class_list():
-    classes = SchoolClass.query.order_by(SchoolClass.name).all()
+    classes = keyset_paginate(SchoolClass.query, [(SchoolClass.name, False), (SchoolClass.id, False)])
     return render_template("admin/class_list.html", classes=classes)
 
 
@@ -139,6 +161,7 @@ def class_create():
         c = SchoolClass(name=form.name.data, academic_year=form.academic_year.data)
         db.session.add(c)
         db.session.commit()
+        reference_data.invalidate("classes")
         flash("Class created.", "success")
         return redirect(url_for("admin.class_list"))
     return render_template("admin/class_form.html", form=form, title="New Class")
@@ -154,6 +177,7 @@ def class_edit(class_id):
         c.name = form.name.data
         c.academic_year = form.academic_year.data
         db.session.commit()
+        reference_data.invalidate("classes")
         flash("Class updated.", "success")
         return redirect(url_for("admin.class_list"))
     return render_template("admin/class_form.html", form=form, class_obj=c, title="Edit Class")
@@ -163,6 +187,7 @@ def class_edit(class_id):
 @admin_bp.route("/subjects")
 @login_required
 @admin_required
+@read_only
 def subject_list():
     subjects = Subject.query.order_by(Subject.name).all()
     return render_template("admin/subject_list.html", subjects=subjects)
@@ -177,6 +202,7 @@ def subject_create():
         s = Subject(name=form.name.data, code=form.code.data or None)
         db.session.add(s)
         db.session.commit()
+        reference_data.invalidate("subjects")
         flash("Subject created.", "success")
         return redirect(url_for("admin.subject_list"))
     return render_template("admin/subject_form.html", form=form, title="New Subject")
@@ -192,6 +218,7 @@ def subject_edit(subject_id):
         s.name = form.name.data
         s.code = form.code.data or None
         db.session.commit()
+        reference_data.invalidate("subjects")
         flash("Subject updated.", "success")
         return redirect(url_for("admin.subject_list"))
     return render_template("admin/subject_form.html", form=form, subject=s, title="Edit Subject")
@@ -1,9 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 
 from app import db
 from app.forms.auth import LoginForm
 from app.models.user import User
+from app.utils.password_pool import password_pool, PasswordPoolBusy
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -27,12 +28,32 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
+        password_hash = user.password_hash if user is not None else None
+        # End the read before hashing: under SQLITE_IMMEDIATE_WRITES this POST's
+        # transaction holds the write lock for as long as it stays open
+        db.session.rollback()
+        pool = password_pool()
+        try:
+            valid = password_hash is not None and pool.verify(password_hash, form.password.data)
+        except PasswordPoolBusy:
+            flash("Too many sign-ins right now. Please try again in a few seconds.", "error")
+            return render_template("auth/login.html", form=form), 429, {"Retry-After": "2"}
+        if not valid:
             flash("Invalid username or password.", "error")
             return render_template("auth/login.html", form=form)
         if not user.is_active:
             flash("Account is deactivated.", "error")
             return render_template("auth/login.html", form=form)
+        method = current_app.config["PASSWORD_HASH_METHOD"]
+        if user.needs_rehash(method):
+            db.session.rollback()
+            try:
+                new_hash = pool.hash(form.password.data, method)
+            except PasswordPoolBusy:
+                new_hash = None  # upgrade on a later login
+            if new_hash:
+                user.password_hash = new_hash
+                db.session.commit()
         login_user(user, remember=form.remember.data)
         next_page = request.args.get("next") or get_redirect_after_login()
         return redirect(next_page)
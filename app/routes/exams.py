@@ -1,11 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import io
+from types import SimpleNamespace
+
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required
-from decimal import Decimal
+from datetime import date
+from sqlalchemy.orm import joinedload
 
 from app import db
-from app.models import Exam, ExamResult, Student, SchoolClass, Subject
-from app.forms.exam import ExamForm
+from app.models import Exam, ExamResult, Student
+from app.models.exam import exam_list_date
+from app.forms.exam import ExamForm, ExamResultsForm, ExamResultUploadForm
+from app.services import reference_data
+from app.services.exam_stats import class_exam_summary, exam_statistics
+from app.services.exam_results import UploadFileError, read_results_form, read_results_upload, save_exam_results
 from app.utils.permissions import admin_required
+from app.utils.pagination import keyset_paginate
+from app.utils.query_budget import query_budget
+from app.utils.replica import read_only
 
 exams_bp = Blueprint("exams", __name__, url_prefix="/exams")
 
@@ -13,8 +24,11 @@ exams_bp = Blueprint("exams", __name__, url_prefix="/exams")
 @exams_bp.route("/")
 @login_required
 @admin_required
+@read_only
 def index():
-    exams = Exam.query.order_by(Exam.exam_date.desc(), Exam.name).all()
+    # Undated exams sort last, as they did with ORDER BY exam_date DESC on SQLite
+    exam_date = exam_list_date(Exam.exam_date)
+    exams = keyset_paginate(Exam.query, [(exam_date, True), (Exam.name, False), (Exam.id, False)])
     return render_template("exams/list.html", exams=exams)
 
 
@@ -23,8 +37,8 @@ def index():
 @admin_required
 def create():
     form = ExamForm()
-    form.class_id.choices = [(c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()]
-    form.subject_id.choices = [(s.id, str(s)) for s in Subject.query.order_by(Subject.name).all()]
+    form.class_id.choices = reference_data.class_choices()
+    form.subject_id.choices = reference_data.subject_choices()
     if form.validate_on_submit():
         exam = Exam(
             name=form.name.data,
@@ -47,8 +61,8 @@ def create():
 def edit(exam_id):
     exam = Exam.query.get_or_404(exam_id)
     form = ExamForm(obj=exam)
-    form.class_id.choices = [(c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()]
-    form.subject_id.choices = [(s.id, str(s)) for s in Subject.query.order_by(Subject.name).all()]
+    form.class_id.choices = reference_data.class_choices()
+    form.subject_id.choices = reference_data.subject_choices()
     if form.validate_on_submit():
         exam.name = form.name.data
         exam.exam_type = form.exam_type.data
@@ -67,10 +81,37 @@ def edit(exam_id):
 @exams_bp.route("/<int:exam_id>")
 @login_required
 @admin_required
+@query_budget(3)
 def detail(exam_id):
     exam = Exam.query.get_or_404(exam_id)
-    results = ExamResult.query.filter_by(exam_id=exam_id).all()
-    return render_template("exams/detail.html", exam=exam, results=results)
+    results = (
+        ExamResult.query.filter_by(exam_id=exam_id)
+        .options(joinedload(ExamResult.student).load_only(Student.first_name, Student.last_name))
+        .all()
+    )
+    return render_template("exams/detail.html", exam=exam, results=results, stats=exam_statistics(exam))
+
+
+@exams_bp.route("/summary")
+@login_required
+@admin_required
+@read_only
+def class_summary():
+    class_id = request.args.get("class_id", type=int)
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    try:
+        start_date = date.fromisoformat(start) if start else None
+        end_date = date.fromisoformat(end) if end else None
+    except ValueError:
+        abort(400)
+    exams, overall = [], None
+    if class_id:
+        exams, overall = class_exam_summary(class_id, start_date=start_date, end_date=end_date)
+    return render_template(
+        "exams/summary.html", exams=exams, overall=overall, classes=reference_data.classes(),
+        class_id=class_id, start=start, end=end,
+    )
 
 
 @exams_bp.route("/<int:exam_id>/results", methods=["GET", "POST"])
@@ -79,29 +120,62 @@ def detail(exam_id):
 def enter_results(exam_id):
     exam = Exam.query.get_or_404(exam_id)
     students = Student.query.filter_by(class_id=exam.class_id).order_by(Student.admission_no).all()
-    if request.method == "POST":
+    form = ExamResultsForm()
+    if form.validate_on_submit():
+        entries, errors = read_results_form(exam, request.form, students)
+        if not errors:
+            save_exam_results(exam, entries)
+            db.session.commit()
+            flash("Results saved.", "success")
+            return redirect(url_for("exams.detail", exam_id=exam_id))
+        for s, error in errors[:10]:
+            flash(f"{s.admission_no}: {error}", "error")
+        flash("Nothing was saved; fix the marks above and submit again.", "error")
+        # Re-render with what was typed
         for s in students:
-            marks_str = request.form.get(f"marks_{s.id}")
-            grade = request.form.get(f"grade_{s.id}") or None
-            remarks = request.form.get(f"remarks_{s.id}") or None
-            marks = None
-            if marks_str is not None and marks_str.strip() != "":
-                try:
-                    marks = Decimal(marks_str)
-                except Exception:
-                    pass
-            rec = ExamResult.query.filter_by(exam_id=exam_id, student_id=s.id).first()
-            if rec:
-                rec.marks_obtained = marks
-                rec.grade = grade
-                rec.remarks = remarks
-            else:
-                rec = ExamResult(exam_id=exam_id, student_id=s.id, marks_obtained=marks, grade=grade, remarks=remarks)
-                db.session.add(rec)
-        db.session.commit()
-        flash("Results saved.", "success")
-        return redirect(url_for("exams.detail", exam_id=exam_id))
-    existing = {r.student_id: r for r in ExamResult.query.filter_by(exam_id=exam_id).all()}
-    for s in students:
-        s._result = existing.get(s.id)
-    return render_template("exams/enter_results.html", exam=exam, students=students)
+            s._result = SimpleNamespace(
+                marks_obtained=request.form.get(f"marks_{s.id}", ""),
+                grade=request.form.get(f"grade_{s.id}", ""),
+                remarks=request.form.get(f"remarks_{s.id}", ""),
+            )
+    else:
+        existing = {r.student_id: r for r in ExamResult.query.filter_by(exam_id=exam_id).all()}
+        for s in students:
+            s._result = existing.get(s.id)
+    return render_template(
+        "exams/enter_results.html", exam=exam, students=students, form=form,
+        upload_form=ExamResultUploadForm(formdata=None),
+    )
+
+
+# Rejected upload rows listed on the page
+UPLOAD_ERRORS_SHOWN = 200
+
+
+@exams_bp.route("/<int:exam_id>/results/upload", methods=["POST"])
+@login_required
+@admin_required
+def upload_results(exam_id):
+    exam = Exam.query.get_or_404(exam_id)
+    upload_form = ExamResultUploadForm()
+    if not upload_form.validate_on_submit():
+        for error in upload_form.results_file.errors or ["Invalid upload."]:
+            flash(error, "error")
+        return redirect(url_for("exams.enter_results", exam_id=exam_id))
+    stream = io.TextIOWrapper(upload_form.results_file.data.stream, encoding="utf-8-sig", newline="")
+    try:
+        entries, errors = read_results_upload(exam, stream)
+    except (UploadFileError, UnicodeDecodeError) as e:
+        flash(f"Could not read file: {e}", "error")
+        return redirect(url_for("exams.enter_results", exam_id=exam_id))
+    if errors:
+        # All or nothing, so a half-applied mark sheet never reaches reports
+        flash(f"{len(errors)} row(s) rejected; nothing was saved.", "error")
+        return render_template(
+            "exams/upload_errors.html", exam=exam, errors=errors[:UPLOAD_ERRORS_SHOWN],
+            total_errors=len(errors), errors_shown=UPLOAD_ERRORS_SHOWN,
+        )
+    saved = save_exam_results(exam, entries)
+    db.session.commit()
+    flash(f"Saved results for {saved} student(s).", "success")
+    return redirect(url_for("exams.detail", exam_id=exam_id))
@@ -1,11 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required
 from decimal import Decimal
+from sqlalchemy.orm import contains_eager, load_only
 
 from app import db
 from app.models import FeeStructure, FeePayment, Student, SchoolClass
 from app.forms.fee import FeeStructureForm, FeePaymentForm
+from app.services import reference_data
+from app.services.fees import OverpaymentError, record_payment, update_amount_due
+from app.services.student_search import search_filter
 from app.utils.permissions import admin_required
+from app.utils.pagination import keyset_paginate
+from app.utils.replica import read_only
 
 fees_bp = Blueprint("fees", __name__, url_prefix="/fees")
 
@@ -13,8 +19,12 @@ fees_bp = Blueprint("fees", __name__, url_prefix="/fees")
 @fees_bp.route("/")
 @login_required
 @admin_required
+@read_only
 def index():
-    structures = FeeStructure.query.order_by(FeeStructure.academic_year.desc(), FeeStructure.class_id).all()
+    structures = keyset_paginate(
+        FeeStructure.query,
+        [(FeeStructure.academic_year, True), (FeeStructure.class_id, False), (FeeStructure.id, False)],
+    )
     return render_template("fees/index.html", structures=structures)
 
 
@@ -23,7 +33,7 @@ def index():
 @admin_required
 def structure_create():
     form = FeeStructureForm()
-    form.class_id.choices = [(c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()]
+    form.class_id.choices = reference_data.class_choices()
     if form.validate_on_submit():
         s = FeeStructure(
             class_id=form.class_id.data,
@@ -34,6 +44,7 @@ def structure_create():
         )
         db.session.add(s)
         db.session.commit()
+        reference_data.invalidate("fee_structures")
         flash("Fee structure created.", "success")
         return redirect(url_for("fees.index"))
     return render_template("fees/structure_form.html", form=form, title="New Fee Structure")
@@ -45,14 +56,16 @@ def structure_create():
 def structure_edit(struct_id):
     s = FeeStructure.query.get_or_404(struct_id)
     form = FeeStructureForm(obj=s)
-    form.class_id.choices = [(c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()]
+    form.class_id.choices = reference_data.class_choices()
     if form.validate_on_submit():
         s.class_id = form.class_id.data
         s.fee_type = form.fee_type.data
         s.amount = form.amount.data
         s.academic_year = form.academic_year.data
         s.term = form.term.data or None
+        update_amount_due(s)
         db.session.commit()
+        reference_data.invalidate("fee_structures")
         flash("Fee structure updated.", "success")
         return redirect(url_for("fees.index"))
     form.class_id.data = s.class_id
@@ -62,6 +75,7 @@ def structure_edit(struct_id):
 @fees_bp.route("/payments")
 @login_required
 @admin_required
+@read_only
 def payment_list():
     class_id = request.args.get("class_id", type=int)
     student_id = request.args.get("student_id", type=int)
@@ -71,7 +85,7 @@ def payment_list():
     if class_id:
         q = q.join(FeePayment.fee_structure).filter(FeeStructure.class_id == class_id)
     payments = q.order_by(FeePayment.payment_date.desc()).limit(200).all()
-    classes = SchoolClass.query.order_by(SchoolClass.name).all()
+    classes = reference_data.classes()
     return render_template("fees/payment_list.html", payments=payments, classes=classes, class_filter=class_id, student_filter=student_id)
 
 
@@ -80,27 +94,94 @@ def payment_list():
 @admin_required
 def payment_create():
     form = FeePaymentForm()
-    form.student_id.choices = [(s.id, str(s)) for s in Student.query.order_by(Student.admission_no).all()]
-    form.fee_structure_id.choices = [(f.id, f"{f.school_class.name} - {f.fee_type} - {f.amount} ({f.academic_year})") for f in FeeStructure.query.join(FeeStructure.school_class).order_by(SchoolClass.name, FeeStructure.fee_type).all()]
+    form.student_id.lookup = _student_label
+    form.fee_structure_id.lookup = _fee_structure_label
     if form.validate_on_submit():
         fs = FeeStructure.query.get(form.fee_structure_id.data)
         if not fs:
             flash("Invalid fee structure.", "error")
-            return render_template("fees/payment_form.html", form=form, title="New Payment")
+            return _payment_form(form)
         amount = form.amount_paid.data
-        if amount > fs.amount:
-            flash(f"Amount paid ({amount}) exceeds structure amount ({fs.amount}). Overpayment not allowed.", "error")
-            return render_template("fees/payment_form.html", form=form, title="New Payment")
-        p = FeePayment(
-            student_id=form.student_id.data,
-            fee_structure_id=form.fee_structure_id.data,
-            amount_paid=amount,
-            payment_date=form.payment_date.data,
-            receipt_no=form.receipt_no.data or None,
-            payment_mode=form.payment_mode.data or None,
-        )
-        db.session.add(p)
+        try:
+            record_payment(
+                form.student_id.data, fs, amount, form.payment_date.data,
+                receipt_no=form.receipt_no.data or None,
+                payment_mode=form.payment_mode.data or None,
+            )
+        except OverpaymentError as e:
+            db.session.rollback()
+            flash(f"Amount paid ({amount}) exceeds outstanding balance ({e.balance}). Overpayment not allowed.", "error")
+            return _payment_form(form)
         db.session.commit()
         flash("Payment recorded.", "success")
         return redirect(url_for("fees.payment_list"))
-    return render_template("fees/payment_form.html", form=form, title="New Payment")
+    return _payment_form(form)
+
+
+def _payment_form(form):
+    return render_template("fees/payment_form.html", form=form, classes=reference_data.classes(), title="New Payment")
+
+
+def _student_label(student_id):
+    row = (
+        db.session.query(Student.first_name, Student.last_name, Student.admission_no)
+        .filter(Student.id == student_id)
+        .first()
+    )
+    return f"{row[0]} {row[1]} ({row[2]})".strip() if row else None
+
+
+def _fee_structure_label(fee_structure_id):
+    ref = reference_data.fee_structure(fee_structure_id)
+    return str(ref) if ref else None
+
+
+# Options per page of the payment form's JSON lookups (?per_page= overrides)
+OPTIONS_PAGE_SIZE = 20
+
+
+@fees_bp.route("/options/students")
+@login_required
+@admin_required
+@read_only
+def student_options():
+    """Student options for the payment form, filtered by class, academic year and ?q=."""
+    q = Student.query.options(load_only(Student.first_name, Student.last_name, Student.admission_no))
+    class_id = request.args.get("class_id", type=int)
+    academic_year = request.args.get("academic_year")
+    search = request.args.get("q")
+    if class_id:
+        q = q.filter(Student.class_id == class_id)
+    if academic_year:
+        q = q.join(Student.school_class).filter(SchoolClass.academic_year == academic_year)
+    condition = search_filter(search) if search else None
+    if condition is not None:
+        q = q.filter(condition)
+    page = keyset_paginate(
+        q, [(Student.admission_no, False), (Student.id, False)],
+        per_page=request.args.get("per_page", OPTIONS_PAGE_SIZE, type=int),
+    )
+    return jsonify(results=[{"id": s.id, "label": str(s)} for s in page], next=page.next_url)
+
+
+@fees_bp.route("/options/structures")
+@login_required
+@admin_required
+@read_only
+def fee_structure_options():
+    """Fee structure options for the payment form, filtered by class and academic year."""
+    q = FeeStructure.query.join(FeeStructure.school_class).options(contains_eager(FeeStructure.school_class))
+    class_id = request.args.get("class_id", type=int)
+    academic_year = request.args.get("academic_year")
+    if class_id:
+        q = q.filter(FeeStructure.class_id == class_id)
+    if academic_year:
+        q = q.filter(FeeStructure.academic_year == academic_year)
+    page = keyset_paginate(
+        q, [(SchoolClass.name, False), (FeeStructure.fee_type, False), (FeeStructure.id, False)],
+        per_page=request.args.get("per_page", OPTIONS_PAGE_SIZE, type=int),
+    )
+    return jsonify(results=[
+        {"id": f.id, "label": f"{f.school_class.name} - {f.fee_type} - {f.amount} ({f.academic_year})"}
+        for f in page
+    ], next=page.next_url)
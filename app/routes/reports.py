@@ -1,13 +1,30 @@
 from datetime import datetime
 from io import StringIO
+from itertools import islice
 import csv
 
-from flask import Blueprint, render_template, request, Response
+from flask import Blueprint, abort, jsonify, redirect, render_template, request, Response, send_file, stream_with_context, url_for
 from flask_login import login_required
 
-from app.models import Student, SchoolClass, Exam
-from app.services.reports import attendance_report_students, exam_performance_report, fees_collected_report
+from app.models import Student, Exam
+from app.services import reference_data
+from app.services.reports import (
+    attendance_report_students,
+    exam_performance_report,
+    fees_collected_report,
+    attendance_detail_rows,
+    exam_result_detail_rows,
+    fee_payment_detail_rows,
+    fee_defaulter_rows,
+    DEFAULTER_SORTS,
+)
+from app.services.attendance_register import class_attendance_register
+from app.services.report_cards import class_report_cards
+from app.services.report_jobs import REPORT_JOBS, report_params, submit_report
+from app.utils.jobs import job_runner
 from app.utils.permissions import admin_required
+from app.utils.query_budget import query_budget
+from app.utils.replica import read_only
 
 reports_bp = Blueprint("reports", __name__, url_prefix="/reports")
 
@@ -22,72 +39,267 @@ def index():
 @reports_bp.route("/attendance", methods=["GET", "POST"])
 @login_required
 @admin_required
+@read_only
 def attendance():
     student_id = request.args.get("student_id", type=int) or request.form.get("student_id", type=int)
     class_id = request.args.get("class_id", type=int) or request.form.get("class_id", type=int)
     start = request.args.get("start") or request.form.get("start")
     end = request.args.get("end") or request.form.get("end")
     group_by = request.args.get("group_by") or request.form.get("group_by") or "month"
+    if request.args.get("background"):
+        return _background_export({"csv": "attendance", "detail": "attendance_detail"})
     start_date = datetime.strptime(start, "%Y-%m-%d").date() if start else None
     end_date = datetime.strptime(end, "%Y-%m-%d").date() if end else None
+    if request.args.get("export") == "detail" and start_date and end_date:
+        return _csv_response(
+            ["Date", "Admission No", "Student", "Class", "Section", "Status", "Remarks"],
+            attendance_detail_rows(student_id=student_id, class_id=class_id, start_date=start_date, end_date=end_date),
+            "attendance_detail.csv",
+        )
     rows = []
     if start_date and end_date:
         rows = attendance_report_students(student_id=student_id, class_id=class_id, start_date=start_date, end_date=end_date, group_by=group_by)
-    students = Student.query.order_by(Student.admission_no).all()
-    classes = SchoolClass.query.order_by(SchoolClass.name).all()
     if request.args.get("export") == "csv" and rows:
         return _csv_response(
             ["Period", "Total Days", "Present", "Absent", "Late", "Percentage"],
             [[r["period"], r["total"], r["present"], r["absent"], r["late"], r["percentage"]] for r in rows],
             "attendance_report.csv",
         )
+    students = Student.query.order_by(Student.admission_no).all()
+    classes = reference_data.classes()
     return render_template("reports/attendance.html", rows=rows, students=students, classes=classes, student_id=student_id, class_id=class_id, start=start, end=end, group_by=group_by)
 
 
+@reports_bp.route("/attendance-register")
+@login_required
+@admin_required
+@read_only
+def attendance_register():
+    class_id = request.args.get("class_id", type=int)
+    section = request.args.get("section") or None
+    month = request.args.get("month") or datetime.now().strftime("%Y-%m")
+    try:
+        first = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        abort(400)
+    register = class_attendance_register(class_id, first.year, first.month, section=section) if class_id else None
+    if request.args.get("export") == "csv" and register:
+        days = range(1, register.days + 1)
+        return _csv_response(
+            ["Admission No", "Student"] + [str(d) for d in days] + ["Present", "Absent", "Late"],
+            ([admission_no, name, *letters, present, absent, late] for admission_no, name, letters, present, absent, late in register.rows()),
+            f"attendance_register_{class_id}_{month}.csv",
+        )
+    return render_template(
+        "reports/attendance_register.html", register=register, classes=reference_data.classes(),
+        class_id=class_id, section=section, month=month,
+    )
+
+
 @reports_bp.route("/exam-performance", methods=["GET", "POST"])
 @login_required
 @admin_required
+@query_budget(4)
+@read_only
 def exam_performance():
     student_id = request.args.get("student_id", type=int) or request.form.get("student_id", type=int)
     class_id = request.args.get("class_id", type=int) or request.form.get("class_id", type=int)
     exam_id = request.args.get("exam_id", type=int) or request.form.get("exam_id", type=int)
+    if request.args.get("background"):
+        return _background_export({"csv": "exam_performance"})
+    if request.args.get("export") == "csv":
+        # Not capped like the on-screen report: every matching result is streamed
+        return _csv_response(
+            ["Student", "Exam", "Subject", "Marks", "Grade"],
+            exam_result_detail_rows(student_id=student_id, class_id=class_id, exam_id=exam_id),
+            "exam_performance_report.csv",
+        )
     rows = exam_performance_report(student_id=student_id, class_id=class_id, exam_id=exam_id)
     students = Student.query.order_by(Student.admission_no).all()
-    classes = SchoolClass.query.order_by(SchoolClass.name).all()
+    classes = reference_data.classes()
     exams = Exam.query.order_by(Exam.exam_date.desc()).limit(100).all()
-    if request.args.get("export") == "csv" and rows:
-        headers = ["Student", "Exam", "Subject", "Marks", "Grade"]
-        data = [[r["student"], r["exam"], r.get("subject", ""), r.get("marks"), r.get("grade")] for r in rows]
-        return _csv_response(headers, data, "exam_performance_report.csv")
     return render_template("reports/exam_performance.html", rows=rows, students=students, classes=classes, exams=exams, student_id=student_id, class_id=class_id, exam_id=exam_id)
 
 
 @reports_bp.route("/fees-collected", methods=["GET", "POST"])
 @login_required
 @admin_required
+@read_only
 def fees_collected():
     academic_year = request.args.get("academic_year") or request.form.get("academic_year")
     term = request.args.get("term") or request.form.get("term")
     class_id = request.args.get("class_id", type=int) or request.form.get("class_id", type=int)
+    if request.args.get("background"):
+        return _background_export({"csv": "fees_collected", "detail": "fees_detail"})
+    if request.args.get("export") == "detail" and academic_year:
+        return _csv_response(
+            ["Payment Date", "Receipt No", "Admission No", "Student", "Class", "Fee Type", "Academic Year", "Term", "Amount Paid", "Payment Mode"],
+            fee_payment_detail_rows(academic_year=academic_year, term=term or None, class_id=class_id),
+            "fee_payments_detail.csv",
+        )
     rows = []
     total_collected = 0
     if academic_year:
         rows, total_collected = fees_collected_report(academic_year=academic_year, term=term or None, class_id=class_id)
-    classes = SchoolClass.query.order_by(SchoolClass.name).all()
     if request.args.get("export") == "csv" and rows:
         return _csv_response(
             ["Class", "Collected", "Expected"],
             [[r["class"], r["collected"], r["expected"]] for r in rows],
             "fees_collected_report.csv",
         )
+    classes = reference_data.classes()
     return render_template("reports/fees_collected.html", rows=rows, total_collected=total_collected, classes=classes, academic_year=academic_year, term=term, class_id=class_id)
 
 
-def _csv_response(headers, rows, filename):
-    si = StringIO()
-    w = csv.writer(si)
-    w.writerow(headers)
-    w.writerows(rows)
-    output = si.getvalue()
-    si.close()
-    return Response(output, mimetype="text/csv", headers={"Content-Disposition": f"attachment; filename={filename}"})
+@reports_bp.route("/report-cards")
+@login_required
+@admin_required
+@read_only
+def report_cards():
+    class_id = request.args.get("class_id", type=int)
+    cards = class_report_cards(class_id) if class_id else None
+    if class_id and cards is None:
+        abort(404)
+    if request.args.get("export") == "csv" and cards:
+        headers = ["Admission No", "Student"] + [f"{name} (%)" for _, name in cards.subjects]
+        return _csv_response(
+            headers + ["Total", "Max Marks", "Percentage", "Rank"],
+            (
+                [r["admission_no"], r["name"]]
+                + [cell[2] if cell else "" for cell in r["subjects"]]
+                + [r["total"], r["max_marks"], "" if r["percentage"] is None else r["percentage"], r["rank"] or ""]
+                for r in cards.rows()
+            ),
+            f"report_cards_{cards.school_class[0]}.csv",
+        )
+    return render_template("reports/report_cards.html", cards=cards, classes=reference_data.classes(), class_id=class_id)
+
+
+# Defaulters listed on the page; the CSV export has all of them
+DEFAULTERS_SHOWN = 500
+
+
+@reports_bp.route("/fee-defaulters")
+@login_required
+@admin_required
+@read_only
+def fee_defaulters():
+    academic_year = request.args.get("academic_year")
+    term = request.args.get("term") or None
+    class_id = request.args.get("class_id", type=int)
+    sort = request.args.get("sort") if request.args.get("sort") in DEFAULTER_SORTS else "owed"
+    if request.args.get("background"):
+        return _background_export({"csv": "fee_defaulters"})
+    rows = []
+    more = False
+    if academic_year:
+        if request.args.get("export") == "csv":
+            return _csv_response(
+                REPORT_JOBS["fee_defaulters"].headers,
+                fee_defaulter_rows(academic_year, term=term, class_id=class_id, sort=sort),
+                "fee_defaulters.csv",
+            )
+        rows = list(islice(fee_defaulter_rows(academic_year, term=term, class_id=class_id, sort=sort), DEFAULTERS_SHOWN + 1))
+        more = len(rows) > DEFAULTERS_SHOWN
+        rows = rows[:DEFAULTERS_SHOWN]
+    return render_template(
+        "reports/fee_defaulters.html", rows=rows, more=more, shown=DEFAULTERS_SHOWN, headers=REPORT_JOBS["fee_defaulters"].headers,
+        classes=reference_data.classes(), academic_year=academic_year, term=term, class_id=class_id, sort=sort,
+    )
+
+
+def _background_export(kinds):
+    # ?background=1 on an export link: queue it and go to the job's status page
+    kind = kinds.get(request.args.get("export"))
+    if kind is None:
+        abort(400)
+    try:
+        params = report_params(kind, request.values)
+    except ValueError:
+        abort(400)
+    job_id, _started = submit_report(kind, params)
+    return redirect(url_for("reports.job_status", job_id=job_id))
+
+
+def _wants_json():
+    return request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json"
+
+
+def _job_json(meta):
+    return {
+        **meta,
+        "status_url": url_for("reports.job_status", job_id=meta["id"], format="json"),
+        "download_url": url_for("reports.job_download", job_id=meta["id"]) if meta["status"] == "done" else None,
+    }
+
+
+@reports_bp.route("/jobs", methods=["POST"])
+@login_required
+@admin_required
+def job_submit():
+    # Form or JSON body: kind plus that report's filters
+    values = request.get_json(silent=True)
+    if values is None:
+        values = request.values
+    elif not isinstance(values, dict):
+        return jsonify(error="expected a JSON object"), 400
+    kind = values.get("kind")
+    if not isinstance(kind, str) or kind not in REPORT_JOBS:
+        return jsonify(error=f"unknown report kind: {kind}"), 400
+    try:
+        params = report_params(kind, values)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    job_id, started = submit_report(kind, params)
+    return jsonify({**_job_json(job_runner().status(job_id)), "deduplicated": not started}), 202
+
+
+@reports_bp.route("/jobs/<job_id>")
+@login_required
+@admin_required
+def job_status(job_id):
+    meta = job_runner().status(job_id)
+    if meta is None:
+        abort(404)
+    if _wants_json():
+        return jsonify(_job_json(meta))
+    return render_template("reports/job.html", job=meta, filename=REPORT_JOBS[meta["kind"]].filename)
+
+
+@reports_bp.route("/jobs/<job_id>/download")
+@login_required
+@admin_required
+def job_download(job_id):
+    path = job_runner().result_path(job_id)
+    if path is None:
+        abort(404)
+    meta = job_runner().status(job_id)
+    return send_file(path, mimetype="text/csv", as_attachment=True, download_name=REPORT_JOBS[meta["kind"]].filename)
+
+
+def _csv_response(headers, rows, filename, chunk_size=500):
+    # Stream the file: the header goes out before the first row is fetched and
+    # rows are flushed every chunk_size lines, so memory stays flat.
+    def generate():
+        buf = StringIO()
+        w = csv.writer(buf)
+        w.writerow(headers)
+        yield _drain(buf)
+        for n, row in enumerate(rows, 1):
+            w.writerow(row)
+            if n % chunk_size == 0:
+                yield _drain(buf)
+        yield _drain(buf)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+def _drain(buf):
+    out = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return out
@@ -1,14 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, current_user
 
+import io
 from datetime import datetime, date as date_type
+from sqlalchemy.orm import contains_eager
 
 from app import db
-from app.models import Student, SchoolClass, StudentAttendance, ExamResult, ConductCertificate
-from app.forms.student import StudentForm
+from app.models import Student, StudentAttendance, Exam, ExamResult, ConductCertificate
+from app.forms.student import StudentForm, StudentImportForm
 from app.forms.attendance import BulkAttendanceForm
 from app.forms.conduct import ConductCertificateForm
+from app.services import reference_data
+from app.services.attendance import move_student_class, read_attendance_form, save_student_attendance
+from app.services.student_import import IMPORT_COLUMNS, ImportFileError, import_students
+from app.services.student_search import search_filter, search_students
 from app.utils.permissions import admin_required
+from app.utils.pagination import keyset_paginate
+from app.utils.query_budget import query_budget
+from app.utils.replica import read_only
 
 students_bp = Blueprint("students", __name__, url_prefix="/students")
 
@@ -17,25 +26,31 @@ def _student_list_query():
     q = Student.query
     class_id = request.args.get("class_id", type=int)
     section = request.args.get("section")
+    search = request.args.get("q")
     if class_id:
         q = q.filter_by(class_id=class_id)
     if section:
         q = q.filter_by(section=section)
-    return q.order_by(Student.admission_no)
+    condition = search_filter(search) if search else None
+    if condition is not None:
+        q = q.filter(condition)
+    return q
 
 
 @students_bp.route("/")
 @login_required
+@read_only
 def index():
     if current_user.can_manage_users() or current_user.is_teacher:
-        students = _student_list_query().all()
-        classes = SchoolClass.query.order_by(SchoolClass.name).all()
+        students = keyset_paginate(_student_list_query(), [(Student.admission_no, False), (Student.id, False)])
+        classes = reference_data.classes()
         return render_template(
             "students/list.html",
             students=students,
             classes=classes,
             class_filter=request.args.get("class_id", type=int),
             section_filter=request.args.get("section"),
+            search=request.args.get("q"),
         )
     # Student: show only self
     if current_user.is_student and current_user.linked_id:
@@ -45,14 +60,38 @@ def index():
     return render_template("students/index.html")
 
 
+# Autocomplete results per request (override with ?limit=, up to SEARCH_LIMIT_MAX)
+SEARCH_LIMIT = 10
+SEARCH_LIMIT_MAX = 50
+
+
+@students_bp.route("/search")
+@login_required
+@read_only
+def search():
+    if not (current_user.can_manage_users() or current_user.is_teacher):
+        abort(403)
+    limit = max(1, min(request.args.get("limit", SEARCH_LIMIT, type=int), SEARCH_LIMIT_MAX))
+    classes = {c.id: c.name for c in reference_data.classes()}
+    return jsonify(results=[
+        {
+            "id": sid,
+            "admission_no": admission_no,
+            "name": f"{first_name} {last_name}".strip(),
+            "class": classes.get(class_id),
+            "section": section,
+            "label": f"{first_name} {last_name} ({admission_no})",
+        }
+        for sid, admission_no, first_name, last_name, class_id, section in search_students(request.args.get("q", ""), limit)
+    ])
+
+
 @students_bp.route("/new", methods=["GET", "POST"])
 @login_required
 @admin_required
 def create():
     form = StudentForm()
-    form.class_id.choices = [("", "")] + [
-        (c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()
-    ]
+    form.class_id.choices = reference_data.class_choices(blank=True)
     if form.validate_on_submit():
         if Student.query.filter_by(admission_no=form.admission_no.data).first():
             flash("Admission number already exists.", "error")
@@ -77,15 +116,46 @@ def create():
     return render_template("students/form.html", form=form, title="New Student")
 
 
+# Rejected rows listed on the result page; the CLI can write the full report
+IMPORT_ERRORS_SHOWN = 200
+
+
+@students_bp.route("/import", methods=["GET", "POST"])
+@login_required
+@admin_required
+def import_csv():
+    form = StudentImportForm()
+    result = None
+    errors = []
+    if form.validate_on_submit():
+        def on_error(line, admission_no, message):
+            if len(errors) < IMPORT_ERRORS_SHOWN:
+                errors.append((line, admission_no, message))
+
+        # The upload is read as a stream (spooled to disk when large), never whole
+        stream = io.TextIOWrapper(form.csv_file.data.stream, encoding="utf-8-sig", newline="")
+        try:
+            result = import_students(stream, on_error, dry_run=form.dry_run.data)
+        except (ImportFileError, UnicodeDecodeError) as e:
+            flash(f"Could not import file: {e}", "error")
+        else:
+            if form.dry_run.data:
+                flash(f"{result['inserted']} of {result['rows']} rows are valid.", "success")
+            else:
+                flash(f"Imported {result['inserted']} of {result['rows']} students.", "success")
+    return render_template(
+        "students/import.html", form=form, result=result, errors=errors,
+        errors_shown=IMPORT_ERRORS_SHOWN, columns=IMPORT_COLUMNS,
+    )
+
+
 @students_bp.route("/<int:student_id>/edit", methods=["GET", "POST"])
 @login_required
 @admin_required
 def edit(student_id):
     student = Student.query.get_or_404(student_id)
     form = StudentForm(obj=student)
-    form.class_id.choices = [("", "")] + [
-        (c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()
-    ]
+    form.class_id.choices = reference_data.class_choices(blank=True)
     if form.validate_on_submit():
         other = Student.query.filter(
             Student.admission_no == form.admission_no.data,
@@ -99,7 +169,9 @@ def edit(student_id):
         student.last_name = form.last_name.data
         student.dob = form.dob.data
         student.gender = form.gender.data or None
-        student.class_id = form.class_id.data or None
+        new_class_id = form.class_id.data or None
+        move_student_class(student.id, student.class_id, new_class_id)
+        student.class_id = new_class_id
         student.section = form.section.data or None
         student.guardian_name = form.guardian_name.data or None
         student.guardian_contact = form.guardian_contact.data or None
@@ -117,9 +189,7 @@ def edit(student_id):
 @admin_required
 def mark_attendance():
     form = BulkAttendanceForm()
-    form.class_id.choices = [("", "")] + [
-        (c.id, str(c)) for c in SchoolClass.query.order_by(SchoolClass.name).all()
-    ]
+    form.class_id.choices = reference_data.class_choices(blank=True)
     if request.method == "POST":
         att_date_str = request.form.get("date")
         class_id = request.form.get("class_id", type=int)
@@ -134,30 +204,13 @@ def mark_attendance():
             if not att_date:
                 flash("Invalid date.", "error")
             else:
-                students = Student.query.filter(Student.class_id == class_id)
+                q = db.session.query(Student.id).filter(Student.class_id == class_id)
                 if section:
-                    students = students.filter(Student.section == section)
-                students = students.order_by(Student.admission_no).all()
-                for s in students:
-                    key = f"status_{s.id}"
-                    status = request.form.get(key)
-                    if status in ("present", "absent", "late"):
-                        rec = StudentAttendance.query.filter_by(
-                            student_id=s.id, date=att_date
-                        ).first()
-                        if rec:
-                            rec.status = status
-                            rec.remarks = request.form.get(f"remarks_{s.id}") or None
-                        else:
-                            rec = StudentAttendance(
-                                student_id=s.id,
-                                date=att_date,
-                                status=status,
-                                remarks=request.form.get(f"remarks_{s.id}") or None,
-                            )
-                            db.session.add(rec)
+                    q = q.filter(Student.section == section)
+                entries = read_attendance_form(request.form, [sid for (sid,) in q])
+                inserted, updated = save_student_attendance(att_date, entries)
                 db.session.commit()
-                flash("Attendance saved.", "success")
+                flash(f"Attendance saved ({inserted} new, {updated} updated).", "success")
                 return redirect(url_for("students.mark_attendance"))
     # GET: show form or list for date+class
     att_date = request.args.get("date")
@@ -209,6 +262,7 @@ def attendance_list(student_id):
 
 @students_bp.route("/<int:student_id>/performance")
 @login_required
+@query_budget(2)
 def performance(student_id):
     student = Student.query.get_or_404(student_id)
     if current_user.is_student and current_user.linked_id != student_id:
@@ -216,6 +270,7 @@ def performance(student_id):
         abort(403)
     records = (
         ExamResult.query.join(ExamResult.exam)
+        .options(contains_eager(ExamResult.exam).joinedload(Exam.subject))
         .filter(ExamResult.student_id == student_id)
         .order_by(ExamResult.exam_id.desc())
         .all()
@@ -6,16 +6,21 @@ from datetime import datetime
 from app import db
 from app.models import Teacher, Subject, SchoolClass, TeacherAttendance
 from app.forms.teacher import TeacherForm
+from app.services import reference_data
+from app.services.attendance import read_attendance_form, save_teacher_attendance
 from app.utils.permissions import admin_required
+from app.utils.pagination import keyset_paginate
+from app.utils.replica import read_only
 
 teachers_bp = Blueprint("teachers", __name__, url_prefix="/teachers")
 
 
 @teachers_bp.route("/")
 @login_required
+@read_only
 def index():
     if current_user.can_manage_users():
-        teachers = Teacher.query.order_by(Teacher.employee_id).all()
+        teachers = keyset_paginate(Teacher.query, [(Teacher.employee_id, False), (Teacher.id, False)])
         return render_template("teachers/list.html", teachers=teachers)
     if current_user.is_teacher and current_user.linked_id:
         teacher = Teacher.query.get(current_user.linked_id)
@@ -99,25 +104,10 @@ def mark_attendance():
             except (ValueError, TypeError):
                 flash("Invalid date.", "error")
             else:
-                teachers = Teacher.query.order_by(Teacher.employee_id).all()
-                for t in teachers:
-                    key = f"status_{t.id}"
-                    status = request.form.get(key)
-                    if status in ("present", "absent", "late"):
-                        rec = TeacherAttendance.query.filter_by(teacher_id=t.id, date=att_date).first()
-                        if rec:
-                            rec.status = status
-                            rec.remarks = request.form.get(f"remarks_{t.id}") or None
-                        else:
-                            rec = TeacherAttendance(
-                                teacher_id=t.id,
-                                date=att_date,
-                                status=status,
-                                remarks=request.form.get(f"remarks_{t.id}") or None,
-                            )
-                            db.session.add(rec)
+                entries = read_attendance_form(request.form, [tid for (tid,) in db.session.query(Teacher.id)])
+                inserted, updated = save_teacher_attendance(att_date, entries)
                 db.session.commit()
-                flash("Attendance saved.", "success")
+                flash(f"Attendance saved ({inserted} new, {updated} updated).", "success")
                 return redirect(url_for("teachers.mark_attendance"))
     att_date = request.args.get("date")
     teachers = Teacher.query.order_by(Teacher.employee_id).all()
@@ -158,7 +148,7 @@ def edit_subjects(teacher_id):
         db.session.commit()
         flash("Subjects updated.", "success")
         return redirect(url_for("teachers.detail", teacher_id=teacher_id))
-    all_subjects = Subject.query.order_by(Subject.name).all()
+    all_subjects = reference_data.subjects()
     selected_ids = [s.id for s in teacher.subjects.all()]
     return render_template(
         "teachers/edit_subjects.html",
@@ -0,0 +1,230 @@
+# Attendance write paths and rollup maintenance
+from collections import Counter, defaultdict
+from datetime import date
+
+from sqlalchemy import Date, and_, case, cast, func, type_coerce
+
+from app import db
+from app.models import (
+    Student,
+    StudentAttendance,
+    Teacher,
+    TeacherAttendance,
+    ClassAttendanceDaily,
+    StudentAttendanceMonthly,
+    TeacherAttendanceMonthly,
+)
+from app.utils.db import upsert_insert
+
+ATTENDANCE_STATUSES = ("present", "absent", "late")
+COUNTERS = ATTENDANCE_STATUSES + ("total",)
+
+
+def read_attendance_form(form, ids):
+    """Collect {id: (status, remarks)} from the ``status_<id>`` / ``remarks_<id>`` form fields."""
+    entries = {}
+    for pk in ids:
+        status = form.get(f"status_{pk}")
+        if status in ATTENDANCE_STATUSES:
+            entries[pk] = (status, form.get(f"remarks_{pk}") or None)
+    return entries
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _count_change(counts, old, new):
+    if old == new:
+        return
+    if old is None:
+        counts["total"] += 1
+    elif old in ATTENDANCE_STATUSES:
+        counts[old] -= 1
+    counts[new] += 1
+
+
+def _bump_counters(model, key_columns, deltas):
+    rows = []
+    for key, counts in deltas.items():
+        if any(counts.values()):
+            row = dict(zip(key_columns, key))
+            row.update({c: counts[c] for c in COUNTERS})
+            rows.append(row)
+    if not rows:
+        return
+    table = model.__table__
+    stmt = upsert_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[c] for c in key_columns],
+        set_={c: table.c[c] + stmt.excluded[c] for c in COUNTERS},
+    )
+    db.session.execute(stmt, rows)
+
+
+def _upsert_attendance(model, owner_column, att_date, entries, known_ids):
+    rows = [
+        {owner_column: pk, "date": att_date, "status": status, "remarks": remarks}
+        for pk, (status, remarks) in entries.items()
+        if pk in known_ids
+    ]
+    if not rows:
+        return
+    table = model.__table__
+    stmt = upsert_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[owner_column], table.c.date],
+        set_={"status": stmt.excluded.status, "remarks": stmt.excluded.remarks},
+    )
+    db.session.execute(stmt, rows)
+
+
+def save_student_attendance(att_date, entries):
+    """Upsert one day's attendance for many students and update the rollups.
+
+    Returns (inserted, updated).
+    """
+    if not entries:
+        return 0, 0
+    # One round trip for each student's class and any status already recorded that day
+    current = (
+        db.session.query(Student.id, Student.class_id, StudentAttendance.status)
+        .outerjoin(
+            StudentAttendance,
+            and_(StudentAttendance.student_id == Student.id, StudentAttendance.date == att_date),
+        )
+        .filter(Student.id.in_(list(entries)))
+        .all()
+    )
+    _upsert_attendance(StudentAttendance, "student_id", att_date, entries, {sid for sid, _, _ in current})
+    month = month_start(att_date)
+    by_class = defaultdict(Counter)
+    by_student = defaultdict(Counter)
+    for sid, class_id, old in current:
+        new = entries[sid][0]
+        if class_id is not None:
+            _count_change(by_class[(class_id, att_date)], old, new)
+        _count_change(by_student[(sid, month)], old, new)
+    _bump_counters(ClassAttendanceDaily, ("class_id", "date"), by_class)
+    _bump_counters(StudentAttendanceMonthly, ("student_id", "month"), by_student)
+    updated = sum(1 for _, _, old in current if old is not None)
+    return len(current) - updated, updated
+
+
+def move_student_class(student_id, old_class_id, new_class_id):
+    """Move a student's ClassAttendanceDaily counters to their new class; the caller commits."""
+    if old_class_id == new_class_id:
+        return
+    per_day = (
+        db.session.query(StudentAttendance.date, *_counter_columns(StudentAttendance.status))
+        .filter(StudentAttendance.student_id == student_id)
+        .group_by(StudentAttendance.date)
+    )
+    by_class = defaultdict(Counter)
+    for att_date, *counts in per_day:
+        for counter, n in zip(COUNTERS, counts):
+            if old_class_id is not None:
+                by_class[(old_class_id, att_date)][counter] -= n
+            if new_class_id is not None:
+                by_class[(new_class_id, att_date)][counter] += n
+    _bump_counters(ClassAttendanceDaily, ("class_id", "date"), by_class)
+
+
+def save_teacher_attendance(att_date, entries):
+    """Upsert one day's attendance for many teachers and update the rollup.
+
+    Returns (inserted, updated).
+    """
+    if not entries:
+        return 0, 0
+    current = (
+        db.session.query(Teacher.id, TeacherAttendance.status)
+        .outerjoin(
+            TeacherAttendance,
+            and_(TeacherAttendance.teacher_id == Teacher.id, TeacherAttendance.date == att_date),
+        )
+        .filter(Teacher.id.in_(list(entries)))
+        .all()
+    )
+    _upsert_attendance(TeacherAttendance, "teacher_id", att_date, entries, {tid for tid, _ in current})
+    month = month_start(att_date)
+    by_teacher = defaultdict(Counter)
+    for tid, old in current:
+        _count_change(by_teacher[(tid, month)], old, entries[tid][0])
+    _bump_counters(TeacherAttendanceMonthly, ("teacher_id", "month"), by_teacher)
+    updated = sum(1 for _, old in current if old is not None)
+    return len(current) - updated, updated
+
+
+# Rebuild / verify
+
+def _month_of(column):
+    if db.engine.dialect.name == "postgresql":
+        return cast(func.date_trunc("month", column), Date)
+    return type_coerce(func.date(column, "start of month"), Date)
+
+
+def _counter_columns(status_column):
+    return [
+        func.sum(case((status_column == s, 1), else_=0)) for s in ATTENDANCE_STATUSES
+    ] + [func.count()]
+
+
+def _expected_rollups():
+    class_daily = (
+        db.session.query(Student.class_id, StudentAttendance.date, *_counter_columns(StudentAttendance.status))
+        .join(StudentAttendance.student)
+        .filter(Student.class_id.isnot(None))
+        .group_by(Student.class_id, StudentAttendance.date)
+    )
+    month = _month_of(StudentAttendance.date)
+    student_monthly = (
+        db.session.query(StudentAttendance.student_id, month, *_counter_columns(StudentAttendance.status))
+        .group_by(StudentAttendance.student_id, month)
+    )
+    month = _month_of(TeacherAttendance.date)
+    teacher_monthly = (
+        db.session.query(TeacherAttendance.teacher_id, month, *_counter_columns(TeacherAttendance.status))
+        .group_by(TeacherAttendance.teacher_id, month)
+    )
+    return [
+        (ClassAttendanceDaily, ("class_id", "date"), class_daily),
+        (StudentAttendanceMonthly, ("student_id", "month"), student_monthly),
+        (TeacherAttendanceMonthly, ("teacher_id", "month"), teacher_monthly),
+    ]
+
+
+def rebuild_attendance_rollups():
+    """Recompute every rollup table from the raw attendance rows. Returns {table: rows}."""
+    written = {}
+    for model, key_columns, query in _expected_rollups():
+        rows = [dict(zip(key_columns + COUNTERS, r)) for r in query]
+        db.session.query(model).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+        written[model.__tablename__] = len(rows)
+    db.session.commit()
+    return written
+
+
+def verify_attendance_rollups():
+    """Compare the rollup tables with the raw rows.
+
+    Returns a list of (table, key, stored, expected) for every counter row that
+    differs; stored/expected are (present, absent, late, total) or None.
+    """
+    drift = []
+    for model, key_columns, query in _expected_rollups():
+        expected = {tuple(r[:2]): tuple(r[2:]) for r in query}
+        stored_query = db.session.query(
+            *[getattr(model, c) for c in key_columns + COUNTERS]
+        )
+        stored = {tuple(r[:2]): tuple(r[2:]) for r in stored_query}
+        for key in sorted(expected.keys() | stored.keys()):
+            have = stored.get(key)
+            want = expected.get(key)
+            if have == (0, 0, 0, 0) and want is None:
+                continue
+            if have != want:
+                drift.append((model.__tablename__, key, have, want))
+    return drift
@@ -0,0 +1,86 @@
+# Monthly class attendance register: students x days of the month, from one
+# query (students LEFT JOIN that month's attendance) pivoted into a bytearray
+# holding one status code per cell.
+import calendar
+from datetime import date
+
+from sqlalchemy import and_, extract
+
+from app import db
+from app.models import Student, StudentAttendance
+from app.services.reports import cached_report
+
+# Cell codes; 0 means no attendance recorded that day
+STATUS_CODES = {"present": ord("P"), "absent": ord("A"), "late": ord("L")}
+
+
+class AttendanceRegister:
+    """``cells[i * days + (day - 1)]`` is student i's STATUS_CODES value for ``day``."""
+
+    def __init__(self, year, month, students):
+        self.year = year
+        self.month = month
+        self.days = calendar.monthrange(year, month)[1]
+        self.students = students  # [(admission_no, name)] by admission_no
+        self.index = {admission_no: i for i, (admission_no, _) in enumerate(students)}
+        self.cells = bytearray(len(students) * self.days)
+
+    def status(self, admission_no, day):
+        """The status letter ("P", "A", "L") or "" if none was recorded."""
+        code = self.cells[self.index[admission_no] * self.days + day - 1]
+        return chr(code) if code else ""
+
+    def weekdays(self):
+        """(day, weekday letter, is_weekend) for each day of the month."""
+        return [
+            (day, "MTWTFSS"[wd], wd >= 5)
+            for day, wd in ((d, date(self.year, self.month, d).weekday()) for d in range(1, self.days + 1))
+        ]
+
+    def rows(self):
+        """(admission_no, name, [letter per day], present, absent, late) per student."""
+        letters = {0: ""} | {code: chr(code) for code in STATUS_CODES.values()}
+        for i, (admission_no, name) in enumerate(self.students):
+            row = self.cells[i * self.days:(i + 1) * self.days]
+            yield (
+                admission_no, name, [letters[c] for c in row],
+                row.count(STATUS_CODES["present"]), row.count(STATUS_CODES["absent"]), row.count(STATUS_CODES["late"]),
+            )
+
+    def day_totals(self, status="present"):
+        """Students with ``status`` on each day."""
+        code = STATUS_CODES[status]
+        return [self.cells[day::self.days].count(code) for day in range(self.days)]
+
+
+@cached_report("student_attendance", "student")
+def class_attendance_register(class_id, year, month, section=None):
+    """AttendanceRegister for the students of a class (and section) in one month."""
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    q = (
+        db.session.query(
+            Student.admission_no,
+            Student.first_name + " " + Student.last_name,
+            extract("day", StudentAttendance.date),
+            StudentAttendance.status,
+        )
+        .outerjoin(StudentAttendance, and_(
+            StudentAttendance.student_id == Student.id,
+            StudentAttendance.date >= first,
+            StudentAttendance.date <= last,
+        ))
+        .filter(Student.class_id == class_id)
+    )
+    if section:
+        q = q.filter(Student.section == section)
+    students, marks = [], []
+    for admission_no, name, day, status in q.order_by(Student.admission_no):
+        if not students or students[-1][0] != admission_no:
+            students.append((admission_no, name))
+        if day is not None:
+            marks.append((len(students) - 1, int(day), status))
+    register = AttendanceRegister(year, month, students)
+    for i, day, status in marks:
+        register.cells[i * register.days + day - 1] = STATUS_CODES.get(status, 0)
+    return register
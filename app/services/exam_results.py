@@ -0,0 +1,116 @@
+# Exam result entry: the marks form and CSV/TSV uploads both end in one
+# batched upsert on uq_exam_result_exam_student.
+import csv
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+from types import SimpleNamespace
+
+from app import db
+from app.models import ExamResult, Student
+from app.utils.db import upsert_insert
+
+UPLOAD_COLUMNS = ("admission_no", "marks", "grade", "remarks")
+GRADE_MAX_LENGTH = ExamResult.__table__.c.grade.type.length
+REMARKS_MAX_LENGTH = ExamResult.__table__.c.remarks.type.length
+
+
+class UploadFileError(ValueError):
+    """The upload as a whole cannot be read (e.g. missing columns)."""
+
+
+def parse_result(exam, marks, grade, remarks):
+    """Validate one student's entry. Returns ((marks, grade, remarks), None) or (None, error)."""
+    marks = (marks or "").strip()
+    grade = (grade or "").strip() or None
+    remarks = (remarks or "").strip() or None
+    value = None
+    if marks:
+        try:
+            value = Decimal(marks)
+        except InvalidOperation:
+            return None, f"marks: '{marks}' is not a number"
+        if not value.is_finite() or value < 0 or value > exam.max_marks:
+            return None, f"marks: must be between 0 and {exam.max_marks}"
+    if grade and len(grade) > GRADE_MAX_LENGTH:
+        return None, f"grade: at most {GRADE_MAX_LENGTH} characters"
+    if remarks and len(remarks) > REMARKS_MAX_LENGTH:
+        return None, f"remarks: at most {REMARKS_MAX_LENGTH} characters"
+    return (value, grade, remarks), None
+
+
+def save_exam_results(exam, entries):
+    """Upsert {student_id: (marks, grade, remarks)} for ``exam`` in one statement.
+
+    The caller commits. Returns the number of rows written.
+    """
+    if not entries:
+        return 0
+    table = ExamResult.__table__
+    stmt = upsert_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.exam_id, table.c.student_id],
+        set_={c: stmt.excluded[c] for c in ("marks_obtained", "grade", "remarks")},
+    )
+    db.session.execute(stmt, [
+        {"exam_id": exam.id, "student_id": sid, "marks_obtained": marks, "grade": grade, "remarks": remarks}
+        for sid, (marks, grade, remarks) in entries.items()
+    ])
+    return len(entries)
+
+
+def read_results_form(exam, form, students):
+    """Collect the marks form's ``marks_<id>`` / ``grade_<id>`` / ``remarks_<id>`` fields.
+
+    Returns (entries, errors); errors are (student, message).
+    """
+    entries, errors = {}, []
+    for s in students:
+        entry, error = parse_result(exam, form.get(f"marks_{s.id}"), form.get(f"grade_{s.id}"), form.get(f"remarks_{s.id}"))
+        if error:
+            errors.append((s, error))
+        else:
+            entries[s.id] = entry
+    return entries, errors
+
+
+def read_results_upload(exam, stream):
+    """Parse a CSV or TSV upload keyed by admission_no for the exam's class.
+
+    Returns (entries, errors); errors are (line, admission_no, message).
+    """
+    header = stream.readline()
+    # Tab-separated if the header has tabs (spreadsheet "copy as text" / .tsv)
+    reader = csv.DictReader(chain([header], stream), delimiter="\t" if "\t" in header else ",")
+    columns = [c.strip() for c in reader.fieldnames or ()]
+    missing = [c for c in ("admission_no", "marks") if c not in columns]
+    if missing:
+        raise UploadFileError(f"missing column(s): {', '.join(missing)}")
+    reader.fieldnames = columns
+
+    # Only students of the exam's class can have a result for it
+    by_admission = dict(
+        db.session.query(Student.admission_no, Student.id).filter(Student.class_id == exam.class_id)
+    )
+    # Parse against a copy of the exam and end the read first, as import_students
+    # does: a POST's transaction holds the SQLite write lock while it is open
+    # (SQLITE_IMMEDIATE_WRITES), and reloading the expired exam would reopen it
+    exam = SimpleNamespace(id=exam.id, max_marks=exam.max_marks)
+    db.session.rollback()
+    entries, seen, errors = {}, {}, []
+    for row in reader:
+        line = reader.line_num
+        admission_no = (row.get("admission_no") or "").strip()
+        sid = by_admission.get(admission_no)
+        if sid is None:
+            errors.append((line, admission_no, "admission_no: no such student in this exam's class"))
+            continue
+        if sid in seen:
+            errors.append((line, admission_no, f"admission_no: duplicate of line {seen[sid]}"))
+            continue
+        seen[sid] = line
+        entry, error = parse_result(exam, row.get("marks"), row.get("grade"), row.get("remarks"))
+        if error:
+            errors.append((line, admission_no, error))
+        else:
+            entries[sid] = entry
+    return entries, errors
@@ -0,0 +1,133 @@
+# Exam statistics. Marks come back from one query per call as floats, already
+# sorted by SQL, and are kept per exam in a compact array("d"); every statistic
+# is then a C-level sum or a bisect over that array instead of Decimal
+# arithmetic on ExamResult objects.
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from math import fsum, sqrt
+from operator import mul
+
+from flask import current_app
+from sqlalchemy import Float, cast, select
+
+from app import db
+from app.models import Exam, ExamResult, Subject
+from app.services.reports import cached_report
+
+HISTOGRAM_BINS = 10  # of max_marks, i.e. 0-10%, 10-20%, ... 90-100%
+PERCENTILES = (10, 25, 75, 90)
+
+
+def _percentile(values, q):
+    # Linear interpolation between closest ranks (NumPy's default method)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def summarize(marks, max_marks, absent=0, pass_percent=None):
+    """Statistics for ``marks``, an ascending sequence of floats out of ``max_marks``.
+
+    ``absent`` counts results without marks. The standard deviation is the
+    population one; percentiles interpolate linearly.
+    """
+    if pass_percent is None:
+        pass_percent = current_app.config["EXAM_PASS_PERCENT"]
+    max_marks = float(max_marks)
+    n = len(marks)
+    stats = {
+        "count": n, "absent": absent, "max_marks": max_marks, "pass_percent": pass_percent,
+        "mean": None, "median": None, "std": None, "min": None, "max": None,
+        "percentiles": {q: None for q in PERCENTILES},
+        "passed": 0, "pass_rate": None,
+    }
+    # Bin k holds marks in [k, k+1) tenths of max_marks; full marks go in the last bin
+    edges = [max_marks * k / HISTOGRAM_BINS for k in range(1, HISTOGRAM_BINS)]
+    cuts = [0] + [bisect_left(marks, e) for e in edges] + [n]
+    stats["histogram"] = [
+        {
+            "label": f"{100 * k // HISTOGRAM_BINS}-{100 * (k + 1) // HISTOGRAM_BINS}%",
+            "count": cuts[k + 1] - cuts[k],
+            "percent": round(100 * (cuts[k + 1] - cuts[k]) / n, 1) if n else 0.0,
+        }
+        for k in range(HISTOGRAM_BINS)
+    ]
+    if not n:
+        return stats
+    mean = fsum(marks) / n
+    variance = max(fsum(map(mul, marks, marks)) / n - mean * mean, 0.0)
+    passed = n - bisect_left(marks, max_marks * pass_percent / 100)
+    stats.update(
+        mean=_round(mean),
+        median=_round(_percentile(marks, 50)),
+        std=_round(sqrt(variance)),
+        min=marks[0],
+        max=marks[-1],
+        percentiles={q: _round(_percentile(marks, q)) for q in PERCENTILES},
+        passed=passed,
+        pass_rate=round(100 * passed / n, 1),
+    )
+    return stats
+
+
+def _marks_by_exam(exam_filter):
+    """{exam_id: ascending array("d") of marks} and {exam_id: results without marks}."""
+    marks = defaultdict(lambda: array("d"))
+    absent = Counter()
+    q = (
+        db.session.query(ExamResult.exam_id, cast(ExamResult.marks_obtained, Float))
+        .filter(exam_filter)
+        .order_by(ExamResult.exam_id, ExamResult.marks_obtained)
+    )
+    for exam_id, value in q:
+        if value is None:
+            absent[exam_id] += 1
+        else:
+            marks[exam_id].append(value)
+    return marks, absent
+
+
+def exam_statistics(exam):
+    """summarize() for one exam's results."""
+    marks, absent = _marks_by_exam(ExamResult.exam_id == exam.id)
+    return summarize(marks[exam.id], exam.max_marks, absent[exam.id])
+
+
+@cached_report("exam", "exam_result", "subject")
+def class_exam_summary(class_id, start_date=None, end_date=None):
+    """Statistics for every exam of a class (optionally dated within a term), in two queries.
+
+    Returns (exams, overall): one dict per exam, oldest first, and summarize()
+    over all their marks as a percentage of each exam's max_marks.
+    """
+    exam_filter = [Exam.class_id == class_id]
+    if start_date:
+        exam_filter.append(Exam.exam_date >= start_date)
+    if end_date:
+        exam_filter.append(Exam.exam_date <= end_date)
+    exams = (
+        db.session.query(Exam.id, Exam.name, Exam.exam_type, Exam.exam_date, Exam.max_marks, Subject.name)
+        .outerjoin(Subject, Subject.id == Exam.subject_id)
+        .filter(*exam_filter)
+        .order_by(Exam.exam_date, Exam.name, Exam.id)
+        .all()
+    )
+    marks, absent = _marks_by_exam(ExamResult.exam_id.in_(select(Exam.id).where(*exam_filter)))
+    rows, percents, total_absent = [], array("d"), 0
+    for exam_id, name, exam_type, exam_date, max_marks, subject in exams:
+        stats = summarize(marks[exam_id], max_marks, absent[exam_id])
+        rows.append({
+            "id": exam_id, "name": name, "exam_type": exam_type, "exam_date": exam_date, "subject": subject,
+            **stats,
+        })
+        scale = 100 / float(max_marks)
+        percents.extend(m * scale for m in marks[exam_id])
+        total_absent += absent[exam_id]
+    overall = summarize(array("d", sorted(percents)), 100, total_absent)
+    return rows, overall
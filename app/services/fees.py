@@ -0,0 +1,122 @@
+# Fee payment writes and the per-student fee ledger (FeeLedger)
+from decimal import Decimal
+
+from sqlalchemy import func, update
+
+from app import db
+from app.models import FeeLedger, FeePayment, FeeStructure
+from app.utils.db import upsert_insert
+
+CENTS = Decimal("0.01")
+
+
+class OverpaymentError(ValueError):
+    """The payment is more than the student still owes on the fee structure."""
+
+    def __init__(self, balance):
+        super().__init__(f"exceeds the outstanding balance ({balance})")
+        self.balance = balance
+
+
+def record_payment(student_id, fee_structure, amount, payment_date, receipt_no=None, payment_mode=None):
+    """Add a FeePayment and move the student's ledger row by ``amount``.
+
+    The balance check and the ledger update are one conditional UPDATE, so two
+    concurrent payments cannot both pass it. Raises OverpaymentError if
+    ``amount`` exceeds the outstanding balance; the caller then rolls back.
+    The caller commits otherwise.
+    """
+    table = FeeLedger.__table__
+    stmt = upsert_insert(table).on_conflict_do_nothing(index_elements=[table.c.student_id, table.c.fee_structure_id])
+    db.session.execute(stmt, {
+        "student_id": student_id, "fee_structure_id": fee_structure.id,
+        "amount_due": fee_structure.amount, "amount_paid": 0, "balance": fee_structure.amount,
+    })
+    key = (FeeLedger.student_id == student_id, FeeLedger.fee_structure_id == fee_structure.id)
+    # Rounded because SQLite keeps NUMERIC values with decimals as floats
+    result = db.session.execute(
+        update(FeeLedger)
+        .where(*key, func.round(FeeLedger.balance - amount, 2) >= 0)
+        .values(
+            amount_paid=func.round(FeeLedger.amount_paid + amount, 2),
+            balance=func.round(FeeLedger.balance - amount, 2),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise OverpaymentError(db.session.query(FeeLedger.balance).filter(*key).scalar())
+    payment = FeePayment(
+        student_id=student_id,
+        fee_structure_id=fee_structure.id,
+        amount_paid=amount,
+        payment_date=payment_date,
+        receipt_no=receipt_no,
+        payment_mode=payment_mode,
+    )
+    db.session.add(payment)
+    return payment
+
+
+def update_amount_due(fee_structure):
+    """Carry a changed FeeStructure.amount into its ledger rows; the caller commits."""
+    db.session.execute(
+        update(FeeLedger)
+        .where(FeeLedger.fee_structure_id == fee_structure.id)
+        .values(amount_due=fee_structure.amount, balance=func.round(fee_structure.amount - FeeLedger.amount_paid, 2))
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Rebuild / verify
+
+def _expected_ledger():
+    """{(student_id, fee_structure_id): (amount_due, amount_paid, balance)} from FeePayment."""
+    q = (
+        db.session.query(FeePayment.student_id, FeePayment.fee_structure_id, FeeStructure.amount, func.sum(FeePayment.amount_paid))
+        .join(FeePayment.fee_structure)
+        .group_by(FeePayment.student_id, FeePayment.fee_structure_id, FeeStructure.amount)
+    )
+    expected = {}
+    for student_id, fee_structure_id, due, paid in q:
+        due, paid = Decimal(due).quantize(CENTS), Decimal(paid).quantize(CENTS)
+        expected[(student_id, fee_structure_id)] = (due, paid, due - paid)
+    return expected
+
+
+def rebuild_fee_ledger():
+    """Recompute the ledger from every FeePayment. Returns the number of rows written."""
+    rows = [
+        {"student_id": sid, "fee_structure_id": fsid, "amount_due": due, "amount_paid": paid, "balance": balance}
+        for (sid, fsid), (due, paid, balance) in _expected_ledger().items()
+    ]
+    db.session.query(FeeLedger).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(FeeLedger.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def verify_fee_ledger():
+    """Compare the ledger with the payments.
+
+    Returns a list of (key, stored, expected) for every row that differs; key is
+    (student_id, fee_structure_id), stored/expected are (amount_due, amount_paid,
+    balance) or None.
+    """
+    expected = _expected_ledger()
+    stored = {
+        (sid, fsid): (Decimal(due).quantize(CENTS), Decimal(paid).quantize(CENTS), Decimal(balance).quantize(CENTS))
+        for sid, fsid, due, paid, balance in db.session.query(
+            FeeLedger.student_id, FeeLedger.fee_structure_id, FeeLedger.amount_due, FeeLedger.amount_paid, FeeLedger.balance,
+        )
+    }
+    drift = []
+    for key in sorted(expected.keys() | stored.keys()):
+        have = stored.get(key)
+        want = expected.get(key)
+        # A row with nothing paid says the same as no row
+        if want is None and have is not None and not have[1]:
+            continue
+        if have != want:
+            drift.append((key, have, want))
+    return drift
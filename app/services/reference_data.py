@@ -0,0 +1,112 @@
+# Process-local cache of rarely changing lookup lists (classes, subjects, fee
+# structures) used to build form choices and filter dropdowns. Entries are
+# reloaded when their version counter is bumped by the admin/fee write routes.
+import threading
+from collections import namedtuple
+
+from flask import current_app
+
+from app import db
+from app.models import SchoolClass, Subject, FeeStructure
+from app.utils.replica import use_primary
+from app.utils.versions import current_version, bump_version
+
+
+class ClassRef(namedtuple("ClassRef", "id name academic_year")):
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.name} ({self.academic_year})"
+
+
+class SubjectRef(namedtuple("SubjectRef", "id name code")):
+    __slots__ = ()
+
+    def __str__(self):
+        return self.name or self.code or ""
+
+
+class FeeStructureRef(namedtuple("FeeStructureRef", "id class_id class_name fee_type amount academic_year term")):
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.class_name} - {self.fee_type} - {self.amount} ({self.academic_year})"
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _cached(name, loader, depends=()):
+    key = (current_app.config["SQLALCHEMY_DATABASE_URI"], name)
+    version = tuple(current_version(n) for n in (name,) + depends)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    # Never fill the shared cache from a lagging replica
+    with use_primary():
+        value = loader()
+    with _lock:
+        _cache[key] = (version, value)
+    return value
+
+
+def _load_classes():
+    q = db.session.query(SchoolClass.id, SchoolClass.name, SchoolClass.academic_year).order_by(SchoolClass.name)
+    return tuple(ClassRef(*r) for r in q)
+
+
+def _load_subjects():
+    q = db.session.query(Subject.id, Subject.name, Subject.code).order_by(Subject.name)
+    return tuple(SubjectRef(*r) for r in q)
+
+
+def _load_fee_structures():
+    q = (
+        db.session.query(
+            FeeStructure.id,
+            FeeStructure.class_id,
+            SchoolClass.name,
+            FeeStructure.fee_type,
+            FeeStructure.amount,
+            FeeStructure.academic_year,
+            FeeStructure.term,
+        )
+        .join(FeeStructure.school_class)
+        .order_by(SchoolClass.name, FeeStructure.fee_type)
+    )
+    return tuple(FeeStructureRef(*r) for r in q)
+
+
+def classes():
+    return _cached("classes", _load_classes)
+
+
+def subjects():
+    return _cached("subjects", _load_subjects)
+
+
+def fee_structures():
+    # Labels include the class name, so class edits invalidate these too
+    return _cached("fee_structures", _load_fee_structures, depends=("classes",))
+
+
+def class_choices(blank=False):
+    choices = [(c.id, str(c)) for c in classes()]
+    return [("", "")] + choices if blank else choices
+
+
+def subject_choices():
+    return [(s.id, str(s)) for s in subjects()]
+
+
+def fee_structure(fee_structure_id):
+    """The cached FeeStructureRef for an id, or None."""
+    by_id = _cached(
+        "fee_structures_by_id", lambda: {f.id: f for f in fee_structures()}, depends=("fee_structures", "classes"),
+    )
+    return by_id.get(fee_structure_id)
+
+
+def invalidate(*names):
+    bump_version(*names)
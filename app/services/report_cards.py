@@ -0,0 +1,119 @@
+# Report cards for a whole class. Every student's per-subject totals come from
+# one grouped query over exam_result and land in flat row-major arrays
+# (student x subject), so a class of 1,000 students is a few hundred ms, not
+# 1,000 calls to students.performance.
+from array import array
+
+from sqlalchemy import Float, cast, func
+
+from app import db
+from app.models import Exam, ExamResult, SchoolClass, Student, Subject
+from app.services.reports import cached_report
+
+
+class ReportCards:
+    """Totals for one class: ``marks[i * len(subjects) + j]`` is student i's sum of
+    marks in subject j, out of ``max_marks[...]`` over ``exams[...]`` marked exams."""
+
+    def __init__(self, school_class, students, subjects):
+        self.school_class = school_class  # (id, name, academic_year)
+        self.students = students  # [(id, admission_no, name)] by admission_no
+        self.subjects = subjects  # [(id, name)] by name
+        size = len(students) * len(subjects)
+        self.marks = array("d", bytes(8 * size))
+        self.max_marks = array("d", bytes(8 * size))
+        self.exams = array("i", bytes(4 * size))
+        self.totals = array("d", bytes(8 * len(students)))
+        self.total_max = array("d", bytes(8 * len(students)))
+
+    def percentage(self, i, j=None):
+        """Student i's percentage in subject j, or overall; None without marks."""
+        if j is None:
+            marks, out_of = self.totals[i], self.total_max[i]
+        else:
+            k = i * len(self.subjects) + j
+            marks, out_of = self.marks[k], self.max_marks[k]
+        return round(100 * marks / out_of, 2) if out_of else None
+
+    def ranks(self):
+        """1-based rank by overall percentage (ties share a rank); None without marks."""
+        pct = [self.percentage(i) for i in range(len(self.students))]
+        order = sorted((p, i) for i, p in enumerate(pct) if p is not None)[::-1]
+        ranks = [None] * len(pct)
+        for pos, (p, i) in enumerate(order):
+            ranks[i] = ranks[order[pos - 1][1]] if pos and order[pos - 1][0] == p else pos + 1
+        return ranks
+
+    def rows(self):
+        """One dict per student for templates and exports."""
+        n = len(self.subjects)
+        ranks = self.ranks()
+        for i, (student_id, admission_no, name) in enumerate(self.students):
+            yield {
+                "student_id": student_id,
+                "admission_no": admission_no,
+                "name": name,
+                "subjects": [
+                    (round(self.marks[i * n + j], 2), self.max_marks[i * n + j], self.percentage(i, j))
+                    if self.exams[i * n + j] else None
+                    for j in range(n)
+                ],
+                "total": round(self.totals[i], 2),
+                "max_marks": self.total_max[i],
+                "percentage": self.percentage(i),
+                "rank": ranks[i],
+            }
+
+
+@cached_report("exam_result", "exam", "student", "subject", "school_class")
+def class_report_cards(class_id):
+    """ReportCards for every student of ``class_id`` (a class belongs to one
+    academic year), or None if there is no such class."""
+    school_class = (
+        db.session.query(SchoolClass.id, SchoolClass.name, SchoolClass.academic_year)
+        .filter(SchoolClass.id == class_id)
+        .first()
+    )
+    if school_class is None:
+        return None
+    students = (
+        db.session.query(Student.id, Student.admission_no, Student.first_name + " " + Student.last_name)
+        .filter(Student.class_id == class_id)
+        .order_by(Student.admission_no)
+        .all()
+    )
+    subjects = (
+        db.session.query(Subject.id, Subject.name)
+        .join(Exam, Exam.subject_id == Subject.id)
+        .filter(Exam.class_id == class_id)
+        .distinct()
+        .order_by(Subject.name, Subject.id)
+        .all()
+    )
+    cards = ReportCards(tuple(school_class), [tuple(s) for s in students], [tuple(s) for s in subjects])
+    row = {s[0]: i for i, s in enumerate(students)}
+    col = {s[0]: j for j, s in enumerate(subjects)}
+    n = len(subjects)
+    totals = (
+        db.session.query(
+            ExamResult.student_id,
+            Exam.subject_id,
+            cast(func.sum(ExamResult.marks_obtained), Float),
+            cast(func.sum(Exam.max_marks), Float),
+            func.count(),
+        )
+        .join(Exam, Exam.id == ExamResult.exam_id)
+        .join(Student, Student.id == ExamResult.student_id)
+        # Results of students who have since moved class stay out of this one's cards
+        .filter(Exam.class_id == class_id, Student.class_id == class_id, ExamResult.marks_obtained.isnot(None))
+        .group_by(ExamResult.student_id, Exam.subject_id)
+    )
+    for student_id, subject_id, marks, out_of, count in totals:
+        i = row[student_id]
+        k = i * n + col[subject_id]
+        cards.marks[k] = marks
+        cards.max_marks[k] = out_of
+        cards.exams[k] = count
+        cards.totals[i] += marks
+        cards.total_max[i] += out_of
+    return cards
@@ -0,0 +1,151 @@
+# Report exports that can run as background jobs (see app/utils/jobs.py).
+# Params are the report's query-string values as strings, so identical
+# requests hash to the same job key.
+import csv
+from collections import namedtuple
+from datetime import date
+
+from app.services.reports import (
+    attendance_report_students,
+    fees_collected_report,
+    attendance_detail_rows,
+    exam_result_detail_rows,
+    fee_payment_detail_rows,
+    fee_defaulter_rows,
+)
+from app.utils.jobs import job_runner
+from app.utils.replica import read_only
+
+ReportJob = namedtuple("ReportJob", "filename headers fields required rows")
+
+
+def _int(params, name):
+    value = params.get(name)
+    return int(value) if value else None
+
+
+def _date(params, name):
+    value = params.get(name)
+    return date.fromisoformat(value) if value else None
+
+
+def _attendance_rows(params):
+    rows = attendance_report_students(
+        student_id=_int(params, "student_id"), class_id=_int(params, "class_id"),
+        start_date=_date(params, "start"), end_date=_date(params, "end"),
+        group_by=params.get("group_by") or "month",
+    )
+    return ([r["period"], r["total"], r["present"], r["absent"], r["late"], r["percentage"]] for r in rows)
+
+
+def _attendance_detail_rows(params):
+    return attendance_detail_rows(
+        student_id=_int(params, "student_id"), class_id=_int(params, "class_id"),
+        start_date=_date(params, "start"), end_date=_date(params, "end"),
+    )
+
+
+def _exam_performance_rows(params):
+    return exam_result_detail_rows(
+        student_id=_int(params, "student_id"), class_id=_int(params, "class_id"), exam_id=_int(params, "exam_id"),
+    )
+
+
+def _fees_collected_rows(params):
+    rows, _total = fees_collected_report(
+        academic_year=params["academic_year"], term=params.get("term"), class_id=_int(params, "class_id"),
+    )
+    return ([r["class"], r["collected"], r["expected"]] for r in rows)
+
+
+def _fees_detail_rows(params):
+    return fee_payment_detail_rows(
+        academic_year=params["academic_year"], term=params.get("term"), class_id=_int(params, "class_id"),
+    )
+
+
+def _fee_defaulters_rows(params):
+    return fee_defaulter_rows(
+        params["academic_year"], term=params.get("term"), class_id=_int(params, "class_id"),
+        sort=params.get("sort") or "owed",
+    )
+
+
+REPORT_JOBS = {
+    "attendance": ReportJob(
+        "attendance_report.csv",
+        ["Period", "Total Days", "Present", "Absent", "Late", "Percentage"],
+        ("student_id", "class_id", "start", "end", "group_by"), ("start", "end"),
+        _attendance_rows,
+    ),
+    "attendance_detail": ReportJob(
+        "attendance_detail.csv",
+        ["Date", "Admission No", "Student", "Class", "Section", "Status", "Remarks"],
+        ("student_id", "class_id", "start", "end"), ("start", "end"),
+        _attendance_detail_rows,
+    ),
+    "exam_performance": ReportJob(
+        "exam_performance_report.csv",
+        ["Student", "Exam", "Subject", "Marks", "Grade"],
+        ("student_id", "class_id", "exam_id"), (),
+        _exam_performance_rows,
+    ),
+    "fees_collected": ReportJob(
+        "fees_collected_report.csv",
+        ["Class", "Collected", "Expected"],
+        ("academic_year", "term", "class_id"), ("academic_year",),
+        _fees_collected_rows,
+    ),
+    "fees_detail": ReportJob(
+        "fee_payments_detail.csv",
+        ["Payment Date", "Receipt No", "Admission No", "Student", "Class", "Fee Type", "Academic Year", "Term", "Amount Paid", "Payment Mode"],
+        ("academic_year", "term", "class_id"), ("academic_year",),
+        _fees_detail_rows,
+    ),
+    "fee_defaulters": ReportJob(
+        "fee_defaulters.csv",
+        ["Admission No", "Student", "Class", "Section", "Guardian Contact", "Due", "Paid", "Owed"],
+        ("academic_year", "term", "class_id", "sort"), ("academic_year",),
+        _fee_defaulters_rows,
+    ),
+}
+
+
+def report_params(kind, values):
+    """Pick ``kind``'s fields out of ``values``; raises ValueError if one is invalid or missing."""
+    job = REPORT_JOBS[kind]
+    params = {}
+    for f in job.fields:
+        value = values.get(f)
+        # JSON bodies may send ids as numbers
+        if isinstance(value, int) and not isinstance(value, bool):
+            value = str(value)
+        elif value is not None and not isinstance(value, str):
+            raise ValueError(f"invalid {f}")
+        if value and value.strip():
+            params[f] = value.strip()
+    missing = [f for f in job.required if f not in params]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    for f in ("student_id", "class_id", "exam_id"):
+        _int(params, f)
+    for f in ("start", "end"):
+        _date(params, f)
+    return params
+
+
+@read_only
+def _write_report(kind, params, out):
+    job = REPORT_JOBS[kind]
+    w = csv.writer(out)
+    w.writerow(job.headers)
+    n = 0
+    for row in job.rows(params):
+        w.writerow(row)
+        n += 1
+    return n
+
+
+def submit_report(kind, params):
+    """Queue a report export. Returns (job_id, started) like JobRunner.submit()."""
+    return job_runner().submit(kind, params, lambda p, out: _write_report(kind, p, out))
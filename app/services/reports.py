@@ -1,95 +1,380 @@
-from datetime import datetime, date, timedelta
-from collections import defaultdict
+import inspect
+import threading
+from copy import deepcopy
+from datetime import timedelta
+from collections import OrderedDict, defaultdict
+from decimal import Decimal
+from functools import wraps
 
+from flask import current_app
+from sqlalchemy import Integer, Numeric, String, and_, case, cast, func, type_coerce
+
+from app import db
 from app.models import (
     StudentAttendance,
     ExamResult,
     FeePayment,
     FeeStructure,
+    FeeLedger,
     Student,
     SchoolClass,
     Exam,
+    Subject,
+    ClassAttendanceDaily,
+    StudentAttendanceMonthly,
 )
+from app.utils.replica import use_primary
+from app.utils.versions import table_versions
+
+
+class ReportCache:
+    """LRU of report results keyed by function and parameters. Each entry carries
+    the version counters of the tables it read and is dropped once any changes."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, value, size):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+report_cache = ReportCache()
+
+
+def cached_report(*tables):
+    """Cache the decorated report by its normalised arguments, invalidated by
+    writes to ``tables`` (see app.utils.versions.track_table_writes)."""
+    def decorator(f):
+        signature = inspect.signature(f)
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            size = current_app.config["REPORT_CACHE_SIZE"]
+            if not size:
+                return f(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(sorted((k, None if v == "" else v) for k, v in bound.arguments.items()))
+            key = (current_app.config["SQLALCHEMY_DATABASE_URI"], f.__name__, params)
+            version = table_versions(*tables)
+            entry = report_cache.get(key, version)
+            if entry is None:
+                # A lagging replica would store old rows under the current versions
+                with use_primary():
+                    value = f(*args, **kwargs)
+                report_cache.put(key, version, value, size)
+            else:
+                value = entry[1]
+            # Callers get their own copy to mutate
+            return deepcopy(value)
+        return wrapper
+    return decorator
+
+
+def _attendance_period(column, group_by):
+    # Period label as a string so that ORDER BY sorts chronologically
+    if db.engine.dialect.name == "postgresql":
+        if group_by == "week":
+            return func.to_char(func.date_trunc("week", column), "YYYY-MM-DD")
+        if group_by == "year":
+            return func.to_char(column, "YYYY")
+        return func.to_char(column, "YYYY-MM")
+    if group_by == "week":
+        # SQLite %w is 0 for Sunday; weeks start on Monday like date.weekday()
+        offset = (cast(func.strftime("%w", column), Integer) + 6) % 7
+        return func.date(column, "-" + cast(offset, String) + " days")
+    if group_by == "year":
+        return func.strftime("%Y", column)
+    return func.strftime("%Y-%m", column)
+
+
+def _status_count(status):
+    return func.sum(case((StudentAttendance.status == status, 1), else_=0))
 
 
-def attendance_report_students(student_id=None, class_id=None, start_date=None, end_date=None, group_by="month"):
-    q = StudentAttendance.query
+def _whole_months(start_date, end_date):
+    return (start_date is None or start_date.day == 1) and (
+        end_date is None or (end_date + timedelta(days=1)).day == 1
+    )
+
+
+def _attendance_counts_query(student_id, class_id, start_date, end_date, group_by, use_rollups):
+    """(period, total, present, absent, late) per period, from a rollup table when the filters allow."""
+    if use_rollups and class_id and not student_id:
+        # Daily per-class counters: any date range and grouping. Only with a class
+        # filter, since students without a class have no counters there.
+        src, day = ClassAttendanceDaily, ClassAttendanceDaily.date
+    elif use_rollups and group_by in ("month", "year") and _whole_months(start_date, end_date):
+        src, day = StudentAttendanceMonthly, StudentAttendanceMonthly.month
+    else:
+        src, day = StudentAttendance, StudentAttendance.date
+    period = _attendance_period(day, group_by).label("period")
+    if src is StudentAttendance:
+        q = db.session.query(
+            period,
+            func.count(StudentAttendance.id),
+            _status_count("present"),
+            _status_count("absent"),
+            _status_count("late"),
+        )
+    else:
+        q = db.session.query(
+            period,
+            func.sum(src.total),
+            func.sum(src.present),
+            func.sum(src.absent),
+            func.sum(src.late),
+        ).having(func.sum(src.total) > 0)
     if student_id:
-        q = q.filter_by(student_id=student_id)
+        q = q.filter(src.student_id == student_id)
     if start_date:
-        q = q.filter(StudentAttendance.date >= start_date)
+        q = q.filter(day >= start_date)
     if end_date:
-        q = q.filter(StudentAttendance.date <= end_date)
+        q = q.filter(day <= end_date)
     if class_id:
-        q = q.join(StudentAttendance.student).filter(Student.class_id == class_id)
-    records = q.all()
-    # Group by week/month/year
-    groups = defaultdict(lambda: {"present": 0, "absent": 0, "late": 0, "total": 0})
-    for r in records:
-        d = r.date
-        if group_by == "week":
-            key = d - timedelta(days=d.weekday())
-        elif group_by == "year":
-            key = date(d.year, 1, 1)
+        if src is ClassAttendanceDaily:
+            q = q.filter(src.class_id == class_id)
         else:
-            key = date(d.year, d.month, 1)
-        groups[key]["total"] += 1
-        groups[key][r.status] = groups[key].get(r.status, 0) + 1
+            q = q.join(Student, Student.id == src.student_id).filter(Student.class_id == class_id)
+    return q.group_by(period).order_by(period.desc())
+
+
+@cached_report("student_attendance", "student", "class_attendance_daily", "student_attendance_monthly")
+def attendance_report_students(student_id=None, class_id=None, start_date=None, end_date=None, group_by="month", use_rollups=True):
+    q = _attendance_counts_query(student_id, class_id, start_date, end_date, group_by, use_rollups)
     rows = []
-    for k in sorted(groups.keys(), reverse=True):
-        g = groups[k]
-        pct = (g["present"] / g["total"] * 100) if g["total"] else 0
+    for key, total, present, absent, late in q:
+        pct = (present / total * 100) if total else 0
         rows.append({
-            "period": k.strftime("%Y-%m" if group_by == "month" else "%Y-%m-%d" if group_by == "week" else "%Y"),
-            "total": g["total"],
-            "present": g["present"],
-            "absent": g["absent"],
-            "late": g["late"],
+            "period": key,
+            "total": total,
+            "present": present,
+            "absent": absent,
+            "late": late,
             "percentage": round(pct, 1),
         })
     return rows
 
 
-def exam_performance_report(student_id=None, class_id=None, exam_id=None):
+def _exam_results_query(student_id=None, class_id=None, exam_id=None):
+    # Only the columns the report and export render, in one joined SELECT
+    q = (
+        db.session.query(
+            Student.first_name,
+            Student.last_name,
+            Exam.name,
+            Subject.name,
+            ExamResult.marks_obtained,
+            ExamResult.grade,
+        )
+        .join(ExamResult.student)
+        .join(ExamResult.exam)
+        .outerjoin(Exam.subject)
+    )
     if exam_id:
-        results = ExamResult.query.filter_by(exam_id=exam_id).all()
-        return [{"student": r.student.full_name, "exam": r.exam.name, "marks": r.marks_obtained, "grade": r.grade} for r in results]
-    q = ExamResult.query
+        q = q.filter(ExamResult.exam_id == exam_id)
     if student_id:
-        q = q.filter_by(student_id=student_id)
+        q = q.filter(ExamResult.student_id == student_id)
     if class_id:
-        q = q.join(ExamResult.student).filter(Student.class_id == class_id)
-    results = q.join(ExamResult.exam).order_by(Exam.id.desc()).limit(500).all()
+        q = q.filter(Student.class_id == class_id)
+    return q.order_by(Exam.id.desc(), ExamResult.id)
+
+
+@cached_report("exam_result", "exam", "student", "subject")
+def exam_performance_report(student_id=None, class_id=None, exam_id=None):
+    q = _exam_results_query(student_id=student_id, class_id=class_id, exam_id=exam_id)
+    if not exam_id:
+        q = q.limit(500)
     return [
-        {"student": r.student.full_name, "exam": r.exam.name, "subject": r.exam.subject.name if r.exam.subject else "", "marks": r.marks_obtained, "grade": r.grade}
-        for r in results
+        {"student": f"{first} {last}".strip(), "exam": exam_name, "subject": subject_name or "", "marks": marks, "grade": grade}
+        for first, last, exam_name, subject_name, marks, grade in q
     ]
 
 
-def fees_collected_report(academic_year=None, term=None, class_id=None):
-    q = FeePayment.query
+def _filter_structures(q, academic_year, term, class_id):
     if academic_year:
-        q = q.join(FeePayment.fee_structure).filter(FeeStructure.academic_year == academic_year)
+        q = q.filter(FeeStructure.academic_year == academic_year)
     if term:
-        q = q.join(FeePayment.fee_structure).filter(FeeStructure.term == term)
+        q = q.filter(FeeStructure.term == term)
     if class_id:
-        q = q.join(FeePayment.fee_structure).filter(FeeStructure.class_id == class_id)
-    payments = q.all()
-    by_class = defaultdict(lambda: {"collected": 0, "expected": 0})
-    total_collected = sum(p.amount_paid for p in payments)
-    for p in payments:
-        fs = p.fee_structure
-        key = fs.school_class.name if fs.school_class else "Unknown"
-        by_class[key]["collected"] += float(p.amount_paid)
-    structures = FeeStructure.query
-    if academic_year:
-        structures = structures.filter_by(academic_year=academic_year)
-    if term:
-        structures = structures.filter(FeeStructure.term == term)
-    if class_id:
-        structures = structures.filter_by(class_id=class_id)
-    for fs in structures.all():
-        key = fs.school_class.name if fs.school_class else "Unknown"
-        by_class[key]["expected"] += float(fs.amount) * Student.query.filter_by(class_id=fs.class_id).count()
+        q = q.filter(FeeStructure.class_id == class_id)
+    return q
+
+
+@cached_report("fee_payment", "fee_structure", "school_class", "student")
+def fees_collected_report(academic_year=None, term=None, class_id=None):
+    class_name = func.coalesce(SchoolClass.name, "Unknown").label("class_name")
+    collected = _filter_structures(
+        db.session.query(class_name, func.sum(FeePayment.amount_paid))
+        .join(FeePayment.fee_structure)
+        .outerjoin(FeeStructure.school_class),
+        academic_year, term, class_id,
+    ).group_by(class_name)
+    headcount = (
+        db.session.query(Student.class_id, func.count(Student.id).label("n"))
+        .group_by(Student.class_id)
+        .subquery()
+    )
+    expected = _filter_structures(
+        db.session.query(class_name, func.sum(FeeStructure.amount * func.coalesce(headcount.c.n, 0)))
+        .outerjoin(FeeStructure.school_class)
+        .outerjoin(headcount, headcount.c.class_id == FeeStructure.class_id),
+        academic_year, term, class_id,
+    ).group_by(class_name)
+    zero = Decimal("0")
+    by_class = defaultdict(lambda: {"collected": zero, "expected": zero})
+    for name, amount in collected:
+        by_class[name]["collected"] = amount or zero
+    for name, amount in expected:
+        by_class[name]["expected"] = amount or zero
+    total_collected = sum((v["collected"] for v in by_class.values()), zero)
     rows = [{"class": k, "collected": v["collected"], "expected": v["expected"]} for k, v in sorted(by_class.items())]
     return rows, total_collected
+
+
+# Raw detail rows for CSV export. These are generators over yield_per queries so
+# exports stream in chunks instead of loading every row.
+EXPORT_CHUNK_SIZE = 1000
+
+
+def attendance_detail_rows(student_id=None, class_id=None, start_date=None, end_date=None):
+    q = (
+        db.session.query(
+            StudentAttendance.date,
+            Student.admission_no,
+            Student.first_name,
+            Student.last_name,
+            SchoolClass.name,
+            Student.section,
+            StudentAttendance.status,
+            StudentAttendance.remarks,
+        )
+        .join(StudentAttendance.student)
+        .outerjoin(Student.school_class)
+    )
+    if student_id:
+        q = q.filter(StudentAttendance.student_id == student_id)
+    if class_id:
+        q = q.filter(Student.class_id == class_id)
+    if start_date:
+        q = q.filter(StudentAttendance.date >= start_date)
+    if end_date:
+        q = q.filter(StudentAttendance.date <= end_date)
+    q = q.order_by(StudentAttendance.date, Student.admission_no)
+    for d, admission_no, first, last, class_name, section, status, remarks in q.yield_per(EXPORT_CHUNK_SIZE):
+        yield [d.isoformat(), admission_no, f"{first} {last}".strip(), class_name or "", section or "", status, remarks or ""]
+
+
+def exam_result_detail_rows(student_id=None, class_id=None, exam_id=None):
+    q = _exam_results_query(student_id=student_id, class_id=class_id, exam_id=exam_id)
+    for first, last, exam_name, subject_name, marks, grade in q.yield_per(EXPORT_CHUNK_SIZE):
+        yield [f"{first} {last}".strip(), exam_name, subject_name or "", marks, grade]
+
+
+def fee_payment_detail_rows(academic_year=None, term=None, class_id=None):
+    q = _filter_structures(
+        db.session.query(
+            FeePayment.payment_date,
+            FeePayment.receipt_no,
+            Student.admission_no,
+            Student.first_name,
+            Student.last_name,
+            SchoolClass.name,
+            FeeStructure.fee_type,
+            FeeStructure.academic_year,
+            FeeStructure.term,
+            FeePayment.amount_paid,
+            FeePayment.payment_mode,
+        )
+        .join(FeePayment.student)
+        .join(FeePayment.fee_structure)
+        .outerjoin(FeeStructure.school_class),
+        academic_year, term, class_id,
+    ).order_by(FeePayment.payment_date, FeePayment.id)
+    for paid_on, receipt, admission_no, first, last, class_name, fee_type, year, fee_term, amount, mode in q.yield_per(EXPORT_CHUNK_SIZE):
+        yield [paid_on.isoformat(), receipt or "", admission_no, f"{first} {last}".strip(), class_name or "", fee_type, year, fee_term or "", amount, mode or ""]
+
+
+# Sort orders for fee_defaulter_rows; admission_no breaks ties
+DEFAULTER_SORTS = {
+    "owed": lambda owed: [owed.desc()],
+    "owed_asc": lambda owed: [owed],
+    "admission_no": lambda owed: [],
+    "name": lambda owed: [Student.last_name, Student.first_name],
+    "class": lambda owed: [SchoolClass.name, owed.desc()],
+}
+
+
+def fee_defaulter_rows(academic_year, term=None, class_id=None, sort="owed"):
+    """Students owing fees on the academic year's (and term's) structures for their class.
+
+    One query: each student x their class's matching FeeStructure rows, less
+    what the fee ledger says they have paid on each (no ledger row means
+    nothing paid), grouped per student and kept where the balance is positive.
+    Streams [admission_no, name, class, section, guardian_contact, due, paid, owed].
+    """
+    # Rounded because SQLite sums NUMERIC values with decimals as floats
+    owed = func.round(func.sum(FeeStructure.amount - func.coalesce(FeeLedger.amount_paid, 0)), 2)
+    q = _filter_structures(
+        db.session.query(
+            Student.admission_no,
+            Student.first_name,
+            Student.last_name,
+            SchoolClass.name,
+            Student.section,
+            Student.guardian_contact,
+            type_coerce(func.round(func.sum(FeeStructure.amount), 2), Numeric(12, 2)),
+            type_coerce(func.round(func.sum(func.coalesce(FeeLedger.amount_paid, 0)), 2), Numeric(12, 2)),
+            type_coerce(owed, Numeric(12, 2)),
+        )
+        .select_from(Student)
+        .join(FeeStructure, FeeStructure.class_id == Student.class_id)
+        .join(SchoolClass, SchoolClass.id == Student.class_id)
+        .outerjoin(FeeLedger, and_(FeeLedger.student_id == Student.id, FeeLedger.fee_structure_id == FeeStructure.id)),
+        academic_year, term, class_id,
+    )
+    q = (
+        q.group_by(Student.id, SchoolClass.id)
+        .having(owed > 0)
+        .order_by(*DEFAULTER_SORTS.get(sort, DEFAULTER_SORTS["owed"])(owed), Student.admission_no)
+    )
+    for admission_no, first, last, class_name, section, contact, total_due, total_paid, balance in q.yield_per(EXPORT_CHUNK_SIZE):
+        yield [admission_no, f"{first} {last}".strip(), class_name, section or "", contact or "", total_due, total_paid, balance]
@@ -0,0 +1,210 @@
+# Bulk student admission from CSV. Rows are validated with StudentForm's own
+# rules, checked against admission numbers and class ids loaded once up front,
+# and inserted in batches of IMPORT_BATCH_SIZE, one transaction per batch, so
+# memory stays flat however long the file is.
+import csv
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from wtforms import DateField, SelectField, StringField
+from wtforms.validators import DataRequired, Optional
+
+from app import db
+from app.forms.student import StudentForm
+from app.models import Student
+from app.services import reference_data
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_COLUMNS = (
+    "admission_no", "first_name", "last_name", "dob", "gender", "class_id", "section",
+    "guardian_name", "guardian_contact", "address", "admission_date",
+)
+REQUIRED_COLUMNS = ("admission_no", "first_name", "last_name")
+
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be imported (e.g. missing columns)."""
+
+
+def _row_values(data):
+    # Same blank-to-NULL handling as students.create
+    return {
+        "admission_no": data["admission_no"],
+        "first_name": data["first_name"],
+        "last_name": data["last_name"],
+        "dob": data["dob"],
+        "gender": data["gender"] or None,
+        "class_id": data["class_id"] or None,
+        "section": data["section"] or None,
+        "guardian_name": data["guardian_name"] or None,
+        "guardian_contact": data["guardian_contact"] or None,
+        "address": data["address"] or None,
+        "admission_date": data["admission_date"],
+    }
+
+
+def _format_errors(errors):
+    return "; ".join(f"{name}: {', '.join(messages)}" for name, messages in errors.items())
+
+
+@lru_cache(maxsize=65536)
+def _parse_date(value, fmt):
+    # Admission files repeat the same few thousand dates; strptime is the slow part
+    return datetime.strptime(value, fmt).date()
+
+
+def _compile_rules(form):
+    """StudentForm's field rules as a plain function, ~10x faster than running the
+    form per row. Returns None if the form uses anything not reproduced here
+    (other field types, validators or filters), in which case the form itself is used.
+
+    The function takes {field: raw string} and returns (data, errors) exactly as
+    form.data / form.errors would after process() + validate().
+    """
+    rules = []
+    for field in form:
+        if field.name == "csrf_token":
+            continue
+        if field.filters or any(type(v) not in (DataRequired, Optional) for v in field.validators):
+            return None
+        if isinstance(field, DateField):
+            kind, extra = "date", field.strptime_format
+        elif type(field) is SelectField:
+            kind, extra = "select", (field.coerce, {field.coerce(c[0]) for c in field.choices})
+        elif isinstance(field, StringField):  # includes TextAreaField
+            kind, extra = "string", None
+        else:
+            return None
+        rules.append((field.name, kind, extra, field.validators, field.gettext))
+
+    def check(raw):
+        data, errors = {}, {}
+        for name, kind, extra, validators, gettext in rules:
+            value = raw[name]
+            field_errors = []
+            if kind == "string":
+                parsed = value
+            elif kind == "date":
+                parsed = None
+                for fmt in extra:
+                    try:
+                        parsed = _parse_date(value, fmt)
+                        break
+                    except ValueError:
+                        pass
+                else:
+                    field_errors.append(gettext("Not a valid date value."))
+            else:
+                coerce, allowed = extra
+                try:
+                    parsed = coerce(value)
+                except ValueError:
+                    parsed = None
+                    field_errors.append(gettext("Invalid Choice: could not coerce."))
+                if parsed not in allowed:
+                    field_errors.append(gettext("Not a valid choice."))
+            for v in validators:
+                if isinstance(v, DataRequired):
+                    if not (parsed and (not isinstance(parsed, str) or parsed.strip())):
+                        field_errors = [v.message or gettext("This field is required.")]
+                        break
+                elif not value.strip():  # Optional
+                    field_errors = []
+                    break
+            data[name] = parsed
+            if field_errors:
+                errors[name] = field_errors
+        return data, errors
+
+    return check
+
+
+def _form_check(form):
+    def check(raw):
+        form.process(MultiDict(raw))
+        form.validate()
+        return form.data, form.errors
+    return check
+
+
+def _insert_batch(batch, on_error):
+    """Insert ``batch`` [(line, values)]; returns the number inserted."""
+    table = Student.__table__
+    try:
+        db.session.execute(table.insert(), [values for _, values in batch])
+        db.session.commit()
+        return len(batch)
+    except IntegrityError:
+        # Someone added one of these admission numbers since the preload
+        db.session.rollback()
+    inserted = 0
+    for line, values in batch:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert(), [values])
+            inserted += 1
+        except IntegrityError:
+            on_error(line, values["admission_no"], "admission_no: already exists")
+    db.session.commit()
+    return inserted
+
+
+def import_students(lines, on_error, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """Import students from CSV text ``lines`` (a file object or any iterable of lines).
+
+    ``on_error(line_no, admission_no, message)`` is called for every rejected row.
+    Returns {"rows", "inserted", "failed"}; with ``dry_run`` nothing is written and
+    "inserted" counts the rows that would have been.
+    """
+    reader = csv.DictReader(lines)
+    columns = [c.strip() for c in reader.fieldnames or ()]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ImportFileError(f"missing column(s): {', '.join(missing)}")
+    unknown = [c for c in columns if c not in IMPORT_COLUMNS]
+    if unknown:
+        raise ImportFileError(f"unknown column(s): {', '.join(unknown)}")
+    reader.fieldnames = columns
+
+    form = StudentForm(formdata=None, meta={"csrf": False})
+    form.class_id.choices = reference_data.class_choices(blank=True)
+    check = _compile_rules(form) or _form_check(form)
+    existing = {a for (a,) in db.session.query(Student.admission_no)}
+    # Parse outside any transaction: a POST's holds the SQLite write lock while
+    # open (SQLITE_IMMEDIATE_WRITES); each batch insert opens and commits its own
+    db.session.rollback()
+
+    seen = {}  # admission_no -> line, for duplicates within the file
+    rows = inserted = failed = 0
+    batch = []
+
+    def reject(line, admission_no, message):
+        nonlocal failed
+        failed += 1
+        on_error(line, admission_no, message)
+
+    for row in reader:
+        rows += 1
+        line = reader.line_num
+        # Absent optional columns count as blank, as an empty form input would
+        data, errors = check({c: (row.get(c) or "").strip() for c in IMPORT_COLUMNS})
+        admission_no = data["admission_no"]
+        if errors:
+            reject(line, admission_no, _format_errors(errors))
+            continue
+        if admission_no in existing:
+            reject(line, admission_no, "admission_no: already exists")
+            continue
+        if admission_no in seen:
+            reject(line, admission_no, f"admission_no: duplicate of line {seen[admission_no]}")
+            continue
+        seen[admission_no] = line
+        batch.append((line, _row_values(data)))
+        if len(batch) >= batch_size:
+            inserted += len(batch) if dry_run else _insert_batch(batch, reject)
+            batch = []
+    if batch:
+        inserted += len(batch) if dry_run else _insert_batch(batch, reject)
+    return {"rows": rows, "inserted": inserted, "failed": failed}
@@ -0,0 +1,119 @@
+# Student search. On SQLite this is an FTS5 index (student_search) over the
+# columns below, with prefix indexes for autocomplete. It is an external-content
+# table kept in step with `student` by triggers, so every write path (the
+# forms, the CSV import, raw SQL) updates it in the same transaction.
+# Other databases fall back to prefix LIKE filters on the same columns.
+import re
+
+from sqlalchemy import Integer, and_, func, or_, text
+
+from app import db
+from app.models import Student
+
+SEARCH_TABLE = "student_search"
+SEARCH_COLUMNS = ("admission_no", "first_name", "last_name", "guardian_name", "guardian_contact")
+MAX_TERMS = 8
+
+_SEARCH_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        {", ".join(SEARCH_COLUMNS)},
+        content='student', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON student BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES (new.id, {", ".join("new." + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON student BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {", ".join("old." + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF {", ".join(SEARCH_COLUMNS)} ON student BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {", ".join("old." + c for c in SEARCH_COLUMNS)});
+        INSERT INTO {SEARCH_TABLE}(rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES (new.id, {", ".join("new." + c for c in SEARCH_COLUMNS)});
+    END""",
+)
+
+
+def _uses_fts():
+    return db.engine.dialect.name == "sqlite"
+
+
+def ensure_search_index():
+    """Create the FTS index and its triggers if missing, filling it from existing
+    students. Returns True if it was created. Called by init_db()."""
+    if not _uses_fts():
+        return False
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_TABLE}
+    ).first()
+    for ddl in _SEARCH_DDL:
+        db.session.execute(text(ddl))
+    if not exists:
+        rebuild_search_index()
+    db.session.commit()
+    return not exists
+
+
+def rebuild_search_index():
+    """Re-read every student into the index; the caller commits."""
+    if _uses_fts():
+        db.session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+
+
+def _terms(query):
+    # Same word characters FTS5's unicode61 tokenizer splits on
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def match_expression(query):
+    """FTS5 query matching students with a word starting with every term, or None."""
+    terms = _terms(query)
+    return " ".join(f'"{t}"*' for t in terms) or None
+
+
+def search_filter(query):
+    """A WHERE clause on Student for ``query`` (every term must prefix-match a
+    searched column), or None for an empty query."""
+    if _uses_fts():
+        expr = match_expression(query)
+        if expr is None:
+            return None
+        ids = text(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match").bindparams(match=expr)
+        return Student.id.in_(ids.columns(rowid=Integer))
+    terms = _terms(query)
+    if not terms:
+        return None
+    return and_(*[
+        or_(*[func.lower(getattr(Student, c)).like(f"{t}%") for c in SEARCH_COLUMNS])
+        for t in terms
+    ])
+
+
+def search_students(query, limit=10):
+    """Best matches for ``query``: (id, admission_no, first_name, last_name, class_id, section) rows."""
+    columns = (Student.id, Student.admission_no, Student.first_name, Student.last_name, Student.class_id, Student.section)
+    if _uses_fts():
+        expr = match_expression(query)
+        if expr is None:
+            return []
+        # An exact admission number first, then FTS5 order. Ranking by bm25 would
+        # score every match, which a one-letter prefix makes the whole table.
+        rows = db.session.execute(
+            text(
+                f"SELECT s.id, s.admission_no, s.first_name, s.last_name, s.class_id, s.section "
+                f"FROM {SEARCH_TABLE} JOIN student s ON s.id = {SEARCH_TABLE}.rowid "
+                f"WHERE {SEARCH_TABLE} MATCH :match LIMIT :limit"
+            ),
+            {"match": expr, "limit": limit},
+        ).all()
+        exact = db.session.query(*columns).filter(Student.admission_no == query.strip()).first()
+        if exact is not None:
+            rows = [exact] + [r for r in rows if r[0] != exact[0]][:limit - 1]
+        return rows
+    condition = search_filter(query)
+    if condition is None:
+        return []
+    return db.session.query(*columns).filter(condition).order_by(Student.admission_no).limit(limit).all()
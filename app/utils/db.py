@@ -0,0 +1,11 @@
+from app import db
+
+
+def upsert_insert(table):
+    """Dialect-specific INSERT that supports ``on_conflict_do_update``."""
+    # Imported here: loading the postgresql dialect costs a noticeable slice of worker boot
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
@@ -0,0 +1,85 @@
+# TTL + LRU cache of the fields current_user needs, so most requests skip the
+# user lookup. Admin user writes bump the "users" version, which every worker
+# checks on each hit, so role changes and deactivations apply at once.
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import UserMixin
+
+from app import db
+from app.models.user import RoleMixin, User
+from app.utils.replica import use_primary
+from app.utils.versions import current_version, bump_version
+
+VERSION_NAME = "users"
+
+
+class CachedIdentity(RoleMixin, UserMixin):
+    def __init__(self, id, username, role, linked_id, active):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.linked_id = linked_id
+        self._active = active
+
+    @property
+    def is_active(self):
+        return self._active
+
+
+class IdentityCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            identity, entry_version, loaded_at = entry
+            if entry_version != version or time.monotonic() - loaded_at > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return identity
+
+    def put(self, key, identity, version, size):
+        with self._lock:
+            self._entries[key] = (identity, version, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = IdentityCache()
+
+
+def load_identity(user_id):
+    """Return the cached identity for ``user_id``, or None if missing or deactivated."""
+    config = current_app.config
+    key = (config["SQLALCHEMY_DATABASE_URI"], user_id)
+    version = current_version(VERSION_NAME)
+    identity = _cache.get(key, version, config["IDENTITY_CACHE_TTL"])
+    if identity is None:
+        with use_primary():
+            row = (
+                db.session.query(User.id, User.username, User.role, User.linked_id, User.is_active)
+                .filter(User.id == user_id)
+                .first()
+            )
+        if row is None:
+            return None
+        identity = CachedIdentity(*row)
+        _cache.put(key, identity, version, config["IDENTITY_CACHE_SIZE"])
+    return identity if identity.is_active else None
+
+
+def invalidate_identities():
+    bump_version(VERSION_NAME)
@@ -0,0 +1,151 @@
+# In-process background jobs with a file-backed result store. Each job is a
+# <id>.json status file plus its <id>.csv result under REPORT_JOB_DIR, so any
+# worker process can answer status polls and downloads. Identical submissions
+# (same kind and params) share one running job through a <key>.claim file
+# that is hard-linked into place, which is atomic across processes.
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from flask import current_app
+
+ACTIVE = ("queued", "running")
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    def __init__(self, app, directory, workers=2, retention=86400, stale_after=3600):
+        self.app = app
+        self.directory = Path(directory)
+        self.retention = retention
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-job")
+        self._lock = threading.Lock()
+
+    def _meta_path(self, job_id):
+        return self.directory / f"{job_id}.json"
+
+    def _write_meta(self, job_id, meta):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{job_id}.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(job_id))
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            meta = self.status(job_id) or {}
+            meta.update(changes)
+            self._write_meta(job_id, meta)
+
+    def status(self, job_id):
+        """The job's status dict, or None for an unknown (or pruned) id."""
+        if not job_id.isalnum():
+            return None
+        try:
+            meta = json.loads(self._meta_path(job_id).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta["status"] in ACTIVE and time.time() - meta["created_at"] > self.stale_after:
+            # The process running it died or it is stuck
+            meta.update(status="failed", error="timed out")
+        return meta
+
+    def result_path(self, job_id):
+        meta = self.status(job_id)
+        if meta is None or meta["status"] != "done":
+            return None
+        return self.directory / f"{job_id}.csv"
+
+    def submit(self, kind, params, fn):
+        """Queue ``fn(params, out)``, which writes the CSV to the text file ``out`` and
+        returns its row count. Returns (job_id, started); started is False when an
+        identical job was already queued or running.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        key = hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()[:24]
+        claim = self.directory / f"{key}.claim"
+        job_id = uuid.uuid4().hex
+        self._write_meta(job_id, {
+            "id": job_id, "kind": kind, "params": params, "status": "queued",
+            "created_at": time.time(), "started_at": None, "finished_at": None,
+            "rows": None, "error": None,
+        })
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.")
+        with os.fdopen(fd, "w") as f:
+            f.write(job_id)
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, claim)
+                    break
+                except FileExistsError:
+                    try:
+                        existing = claim.read_text().strip()
+                    except FileNotFoundError:
+                        continue
+                    meta = self.status(existing)
+                    if meta is not None and meta["status"] in ACTIVE:
+                        self._meta_path(job_id).unlink()
+                        return existing, False
+                    # Left behind by a finished or dead job
+                    claim.unlink(missing_ok=True)
+            else:
+                raise RuntimeError(f"could not claim job key {key}")
+        finally:
+            os.unlink(tmp)
+        self._executor.submit(self._run, job_id, claim, params, fn)
+        return job_id, True
+
+    def _run(self, job_id, claim, params, fn):
+        self._update(job_id, status="running", started_at=time.time())
+        target = self.directory / f"{job_id}.csv"
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{job_id}.", suffix=".csv")
+        try:
+            with self.app.app_context():
+                with os.fdopen(fd, "w", newline="") as out:
+                    rows = fn(params, out)
+            os.replace(tmp, target)
+            self._update(job_id, status="done", finished_at=time.time(), rows=rows)
+        except Exception as e:
+            logger.exception("report job %s failed", job_id)
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+        finally:
+            try:
+                if claim.read_text().strip() == job_id:
+                    claim.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for path in self.directory.iterdir():
+            if path.suffix in (".json", ".csv"):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def init_job_runner(app):
+    app.extensions["job_runner"] = JobRunner(
+        app,
+        app.config["REPORT_JOB_DIR"],
+        workers=app.config["REPORT_JOB_WORKERS"],
+        retention=app.config["REPORT_JOB_RETENTION"],
+    )
+
+
+def job_runner():
+    return current_app.extensions["job_runner"]
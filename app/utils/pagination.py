@@ -0,0 +1,104 @@
+# Keyset (cursor) pagination for list views
+import base64
+import json
+from datetime import date
+
+from flask import current_app, request, url_for
+from sqlalchemy import Date, and_, or_
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def _url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+        args.update(cursor)
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, order):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(order):
+        return None
+    out = []
+    for (expr, _desc), v in zip(order, values):
+        if v is not None and isinstance(expr.type, Date):
+            try:
+                v = date.fromisoformat(v)
+            except (ValueError, TypeError):
+                return None
+        out.append(v)
+    return out
+
+
+def _seek(order, values, forward):
+    # Row-value comparison spelled out so mixed ASC/DESC keys work on every backend:
+    # (a > A) OR (a = A AND b > B) OR ...
+    clauses = []
+    for i, ((expr, desc), value) in enumerate(zip(order, values)):
+        ahead = (expr < value) if desc == forward else (expr > value)
+        prefix = [o[0] == v for o, v in zip(order[:i], values[:i])]
+        clauses.append(and_(*prefix, ahead))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, order, per_page=None):
+    """Page ``query`` by ``order``: a list of (expression, descending) pairs whose
+    last entry is unique (normally the primary key). Reads ``after``/``before``/
+    ``per_page`` from the request args.
+    """
+    max_size = current_app.config["LIST_PAGE_SIZE_MAX"]
+    per_page = per_page or request.args.get("per_page", type=int) or current_app.config["LIST_PAGE_SIZE"]
+    per_page = max(1, min(per_page, max_size))
+    after = request.args.get("after")
+    before = request.args.get("before")
+    forward = not before
+    cursor = decode_cursor(after or before, order) if (after or before) else None
+
+    q = query.add_columns(*[expr for expr, _ in order])
+    if cursor is not None:
+        q = q.filter(_seek(order, cursor, forward))
+    q = q.order_by(None).order_by(
+        *[(expr.desc() if desc == forward else expr.asc()) for expr, desc in order]
+    )
+    rows = q.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+    items = [r[0] for r in rows]
+    keys = [tuple(r[1:]) for r in rows]
+    if not rows:
+        return KeysetPage(items)
+    has_next = more if forward else True
+    has_prev = (cursor is not None) if forward else more
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(keys[-1]) if has_next else None,
+        prev_cursor=encode_cursor(keys[0]) if has_prev else None,
+    )
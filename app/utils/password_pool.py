@@ -0,0 +1,91 @@
+# Bounded worker pool for password hashing. scrypt/pbkdf2 release the GIL, so a
+# few threads run them in parallel while the admission limit keeps a login rush
+# from tying up every request worker: once workers + queue slots are taken,
+# callers get PasswordPoolBusy straight away. A hash that outlasts the caller's
+# timeout also gives PasswordPoolBusy, but keeps its slot until it finishes.
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordPool:
+    def __init__(self, workers=2, queue_size=8, timeout=10.0, window=1000):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._rejected = 0
+        self._latencies = deque(maxlen=window)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordPoolBusy()
+        with self._lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        started = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._done(started)
+            raise
+        # The slot is held until the hash finishes, even if the caller gave up on it
+        future.add_done_callback(lambda _: self._done(started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordPoolBusy() from None
+
+    def _done(self, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._in_flight -= 1
+            self._latencies.append(elapsed_ms)
+        self._slots.release()
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash(self, password, method):
+        return self._run(generate_password_hash, password, method)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight, max_in_flight, rejected = self._in_flight, self._max_in_flight, self._rejected
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] if latencies else None
+
+        return {
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "max_in_flight": max_in_flight,
+            "rejected": rejected,
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "max": latencies[-1] if latencies else None},
+        }
+
+
+def init_password_pool(app):
+    app.extensions["password_pool"] = PasswordPool(
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        queue_size=app.config["PASSWORD_HASH_QUEUE"],
+    )
+
+
+def password_pool():
+    return current_app.extensions["password_pool"]
@@ -0,0 +1,66 @@
+# Query-count guard for tests: fail a block or view that issues more SQL
+# statements than it declares.
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import event
+
+from app import db
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Count statements executed on ``engine`` (default: every engine in db.engines,
+    so @read_only queries on the replica count too) inside the block."""
+    engines = [engine] if engine is not None else list(dict.fromkeys(db.engines.values()))
+    counter = QueryCounter()
+    for e in engines:
+        event.listen(e, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(budget, label="block", engine=None):
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > budget:
+        raise QueryBudgetExceeded(
+            f"{label} ran {counter.count} queries (budget {budget}):\n" + "\n".join(counter.statements)
+        )
+
+
+def query_budget(budget):
+    """Declare the most queries a view body, template rendering included, may run.
+
+    Only enforced when the QUERY_BUDGETS_ENFORCED config flag is set, as it is in
+    tests/test_query_budgets.py.
+    """
+    def decorator(f):
+        @wraps(f)
+        def inner(*args, **kwargs):
+            if not current_app.config.get("QUERY_BUDGETS_ENFORCED"):
+                return f(*args, **kwargs)
+            with assert_max_queries(budget, label=f.__name__):
+                return f(*args, **kwargs)
+        inner.query_budget = budget
+        return inner
+    return decorator
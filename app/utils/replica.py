@@ -0,0 +1,205 @@
+# Read-replica routing. Views marked @read_only send their SELECTs to the
+# "replica" bind; flushes, and everything outside those views, use the primary.
+#
+# READ_REPLICA selects the replica:
+#   "snapshot"  a copy of the SQLite file, refreshed in the background once it
+#               is older than half of READ_REPLICA_MAX_LAG
+#   "readonly"  a mode=ro connection to the primary SQLite file (never stale)
+#   any URL     an external replica, e.g. a PostgreSQL hot standby
+# A request only reads from the replica while its lag is within
+# READ_REPLICA_MAX_LAG seconds, and a user's requests stay on the primary for
+# that long after they write, so they always see their own changes.
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Delete, Insert, Update, text
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = "replica"
+# How often the lag of an external replica is re-measured (seconds)
+LAG_CHECK_INTERVAL = 1.0
+
+_refresh_lock = threading.Lock()
+_refreshing = set()
+_lag_cache = {}
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+                g._replica_wrote = True
+            elif g.get("_read_replica"):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sqlite_path(uri):
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return None
+    return url.database
+
+
+def snapshot_path(app):
+    configured = app.config.get("READ_REPLICA_SNAPSHOT")
+    return Path(configured or _sqlite_path(app.config["SQLALCHEMY_DATABASE_URI"]) + ".replica")
+
+
+def configure_replica(app):
+    """Add the replica bind to SQLALCHEMY_BINDS. Call before db.init_app()."""
+    mode = app.config.get("READ_REPLICA")
+    if not mode:
+        return
+    primary = _sqlite_path(app.config["SQLALCHEMY_DATABASE_URI"])
+    if mode in ("snapshot", "readonly") and primary is None:
+        raise RuntimeError(f'READ_REPLICA="{mode}" needs a file-based SQLite primary database')
+    if mode == "snapshot":
+        url = f"sqlite:///file:{snapshot_path(app)}?mode=ro&uri=true"
+    elif mode == "readonly":
+        url = f"sqlite:///file:{primary}?mode=ro&uri=true"
+    else:
+        url = mode
+    options = {"url": url}
+    if mode == "snapshot":
+        from sqlalchemy.pool import NullPool
+        # Fresh connections, so a replaced snapshot file is picked up immediately
+        options["poolclass"] = NullPool
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    binds[REPLICA_BIND] = options
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+    @app.after_request
+    def _pin_after_write(response):
+        if g.pop("_replica_wrote", False):
+            session["_primary_until"] = time.time() + app.config["READ_REPLICA_MAX_LAG"]
+        return response
+
+
+def refresh_snapshot(app):
+    """Copy the primary SQLite database over the snapshot file. Returns its path."""
+    from app import db
+
+    target = snapshot_path(app)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+    os.close(fd)
+    try:
+        with app.app_context():
+            raw = db.engines[None].raw_connection()
+        try:
+            dst = sqlite3.connect(tmp)
+            try:
+                raw.driver_connection.backup(dst)
+                # A read-only connection cannot open a WAL file without its -shm
+                dst.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                dst.close()
+        finally:
+            raw.close()
+        os.chmod(tmp, os.stat(_sqlite_path(app.config["SQLALCHEMY_DATABASE_URI"])).st_mode & 0o777)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return target
+
+
+def _refresh_in_background(app):
+    key = str(snapshot_path(app))
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            refresh_snapshot(app)
+        except Exception:
+            app.logger.exception("read replica snapshot refresh failed")
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name="replica-snapshot", daemon=True).start()
+
+
+def replica_lag():
+    """Seconds the replica is behind the primary, or None if it is unusable."""
+    from app import db
+
+    app = current_app._get_current_object()
+    mode = app.config.get("READ_REPLICA")
+    if mode == "readonly":
+        return 0.0
+    if mode == "snapshot":
+        try:
+            age = time.time() - os.stat(snapshot_path(app)).st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is None or age > app.config["READ_REPLICA_MAX_LAG"] / 2:
+            _refresh_in_background(app)
+        return age
+    engine = db.engines.get(REPLICA_BIND)
+    if engine is None or engine.dialect.name != "postgresql":
+        return 0.0
+    now = time.monotonic()
+    cached = _lag_cache.get(engine.url)
+    if cached and now - cached[0] < LAG_CHECK_INTERVAL:
+        return cached[1]
+    try:
+        with engine.connect() as conn:
+            lag = conn.execute(text(
+                "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+            )).scalar()
+        lag = float(lag)
+    except Exception:
+        app.logger.warning("read replica lag check failed", exc_info=True)
+        lag = None
+    _lag_cache[engine.url] = (now, lag)
+    return lag
+
+
+def _use_replica():
+    app = current_app
+    if not app.config.get("READ_REPLICA"):
+        return False
+    if has_request_context() and session.get("_primary_until", 0) > time.time():
+        return False
+    lag = replica_lag()
+    return lag is not None and lag <= app.config["READ_REPLICA_MAX_LAG"]
+
+
+def read_only(f):
+    """Serve the view's queries from the read replica when it is fresh enough."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # Kept on g, not reset on return, so streamed responses read from it too
+        g._read_replica = _use_replica()
+        g._read_only_view = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+@contextmanager
+def use_primary():
+    """Force the primary inside a @read_only view (e.g. for values that get cached)."""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get("_read_replica", False)
+    g._read_replica = False
+    try:
+        yield
+    finally:
+        g._read_replica = previous
@@ -0,0 +1,56 @@
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+from app.utils.replica import REPLICA_BIND
+
+# Need write access; skipped on the read-only replica bind
+WRITE_PRAGMAS = ("journal_mode", "synchronous")
+# Requests whose transactions only read
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+def configure_sqlite(app):
+    """Apply SQLITE_PRAGMAS to every new connection on the app's SQLite engines,
+    and SQLITE_IMMEDIATE_WRITES to the primary."""
+    pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+    immediate = app.config.get("SQLITE_IMMEDIATE_WRITES")
+    if not pragmas and not immediate:
+        return
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        if engine.dialect.name != "sqlite":
+            continue
+        settings = pragmas
+        if key == REPLICA_BIND:
+            settings = {k: v for k, v in pragmas.items() if k not in WRITE_PRAGMAS}
+        if settings:
+            event.listen(engine, "connect", _pragma_setter(settings))
+        if immediate and key != REPLICA_BIND:
+            event.listen(engine, "connect", _manual_begin)
+            event.listen(engine, "begin", _begin)
+
+
+def _pragma_setter(settings):
+    def _apply_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in settings.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return _apply_pragmas
+
+
+def _manual_begin(dbapi_conn, connection_record):
+    # Stop the sqlite3 driver issuing its own deferred BEGIN; _begin does it
+    dbapi_conn.isolation_level = None
+
+
+def _begin(conn):
+    # Writing requests take the write lock up front, where busy_timeout applies
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if _writing_request() else "BEGIN")
+
+
+def _writing_request():
+    # POSTs to @read_only views (report filters) only read
+    return has_request_context() and request.method not in SAFE_METHODS and not g.get("_read_only_view")
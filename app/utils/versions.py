@@ -0,0 +1,86 @@
+# Shared version counters for process-local caches. Each counter is a small
+# file under CACHE_VERSION_DIR: bumping replaces the file, and readers compare
+# its stat() signature, so every worker process sees an invalidation without a
+# database round trip.
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+def _version_dir():
+    return Path(current_app.config["CACHE_VERSION_DIR"])
+
+
+def current_version(name):
+    try:
+        st = os.stat(_version_dir() / name)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def bump_version(*names):
+    """Invalidate every cache entry tagged with ``names``. Call after the commit."""
+    directory = _version_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+        with os.fdopen(fd, "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp, directory / name)
+
+
+# Per-table counters, bumped after any commit that wrote to the table (ORM
+# flushes and Core insert/update/delete run through the session alike).
+TABLE_PREFIX = "table."
+_tracking = False
+
+
+def table_versions(*tables):
+    return tuple(current_version(TABLE_PREFIX + t) for t in tables)
+
+
+def _written(session):
+    return session.info.setdefault("written_tables", set())
+
+
+def _after_flush(session, flush_context):
+    written = _written(session)
+    for obj in list(session.new) + list(session.deleted):
+        written.update(t.name for t in inspect(obj).mapper.tables)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            written.update(t.name for t in inspect(obj).mapper.tables)
+
+
+def _do_orm_execute(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None and hasattr(table, "name"):
+            _written(state.session).add(table.name)
+
+
+def _after_commit(session):
+    written = session.info.pop("written_tables", None)
+    if written and has_app_context():
+        bump_version(*(TABLE_PREFIX + t for t in sorted(written)))
+
+
+def _after_rollback(session):
+    session.info.pop("written_tables", None)
+
+
+def track_table_writes():
+    global _tracking
+    if _tracking:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _tracking = True
@@ -1,9 +1,12 @@
 import os
-from app import create_app
+from app import create_app, init_db
+from app.config import config_by_name
 
-app = create_app()
+app = create_app(config_by_name[os.environ.get("APP_CONFIG", "default")])
 
 if __name__ == "__main__":
+    # Dev server convenience; deployments run `flask init-db` once instead
+    init_db(app)
     app.run(
         host="0.0.0.0",
         port=int(os.environ.get("PORT", 5000))
@@ -0,0 +1,32 @@
+import pytest
+
+from app import create_app, init_db
+from app.config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """App on a throwaway SQLite file; keyword arguments override config."""
+    def make(**overrides):
+        config = type("TestConfig", (Config,), {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'school.db'}",
+            "CACHE_VERSION_DIR": str(tmp_path / "cache_versions"),
+            "REPORT_JOB_DIR": str(tmp_path / "report_jobs"),
+            "WTF_CSRF_ENABLED": False,
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            **overrides,
+        })
+        app = create_app(config)
+        init_db(app)
+        return app
+    return make
+
+
+@pytest.fixture
+def admin_client():
+    def login(app):
+        client = app.test_client()
+        client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+        return client
+    return login
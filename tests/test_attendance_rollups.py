@@ -0,0 +1,67 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import ClassAttendanceDaily, SchoolClass, Student
+from app.services.attendance import verify_attendance_rollups
+from app.services.reports import attendance_report_students
+
+DAY = date(2024, 3, 4)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(REPORT_CACHE_SIZE=0)
+    with app.app_context():
+        db.session.add_all([SchoolClass(name="Class 1"), SchoolClass(name="Class 2")])
+        db.session.flush()
+        db.session.add_all([Student(admission_no=f"S{i}", first_name="A", last_name=str(i), class_id=1) for i in range(3)])
+        db.session.commit()
+    return app
+
+
+def _mark(client, class_id, statuses):
+    data = {"date": DAY.isoformat(), "class_id": class_id}
+    data.update({f"status_{sid}": status for sid, status in statuses.items()})
+    response = client.post("/students/attendance", data=data)
+    assert response.status_code == 302
+
+
+def _counts(class_id):
+    row = db.session.query(ClassAttendanceDaily).filter_by(class_id=class_id, date=DAY).one_or_none()
+    return row and (row.present, row.absent, row.late, row.total)
+
+
+def _report(**filters):
+    by_rollups = attendance_report_students(group_by="day", **filters)
+    assert by_rollups == attendance_report_students(group_by="day", use_rollups=False, **filters)
+    return by_rollups
+
+
+def test_rollups_follow_status_changes(app, admin_client):
+    client = admin_client(app)
+    _mark(client, 1, {1: "present", 2: "absent", 3: "late"})
+    _mark(client, 1, {1: "absent", 2: "absent"})
+    with app.app_context():
+        assert verify_attendance_rollups() == []
+        assert _counts(1) == (0, 2, 1, 3)
+        assert _report(class_id=1)[0]["absent"] == 2
+
+
+def test_rollups_follow_a_class_move(app, admin_client):
+    client = admin_client(app)
+    _mark(client, 1, {1: "present", 2: "absent", 3: "present"})
+    response = client.post("/students/1/edit", data={"admission_no": "S0", "first_name": "A", "last_name": "0", "class_id": 2})
+    assert response.status_code == 302
+    with app.app_context():
+        assert verify_attendance_rollups() == []
+        assert _counts(1) == (1, 1, 0, 2)
+        assert _counts(2) == (1, 0, 0, 1)
+        assert _report(class_id=2)[0]["present"] == 1
+    # Out of any class: the counters leave with the student
+    client.post("/students/1/edit", data={"admission_no": "S0", "first_name": "A", "last_name": "0", "class_id": ""})
+    with app.app_context():
+        assert verify_attendance_rollups() == []
+        assert _counts(2) == (0, 0, 0, 0)
+        assert _report(student_id=1)[0]["present"] == 1
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import Exam, SchoolClass, Subject
+from app.models.exam import exam_list_date
+from app.utils.pagination import keyset_paginate
+
+# As exams.index pages the list
+ORDER = [(exam_list_date(Exam.exam_date), True), (Exam.name, False), (Exam.id, False)]
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        school_class = SchoolClass(name="Class 1")
+        subject = Subject(name="Maths", code="M")
+        db.session.add_all([school_class, subject])
+        db.session.flush()
+        for i in range(30):
+            exam_date = None if i % 7 == 0 else date(2024, 1, 1) + timedelta(days=i % 5)
+            db.session.add(Exam(name=f"Exam {i % 4}", class_id=school_class.id, subject_id=subject.id,
+                                max_marks=100, exam_date=exam_date))
+        db.session.commit()
+    return app
+
+
+def _page(app, **args):
+    with app.test_request_context(query_string={"per_page": 4, **args}):
+        page = keyset_paginate(Exam.query, ORDER)
+        return [e.id for e in page.items], page.next_cursor, page.prev_cursor
+
+
+def test_pages_forward_and_back_in_list_order(app):
+    with app.app_context():
+        exams = Exam.query.all()
+        expected = [e.id for e in sorted(exams, key=lambda e: (-(e.exam_date or date.min).toordinal(), e.name, e.id))]
+        assert db.session.get(Exam, expected[-1]).exam_date is None
+    pages = []
+    ids, after, _ = _page(app)
+    pages.append(ids)
+    while after:
+        ids, after, before = _page(app, after=after)
+        pages.append(ids)
+    assert sum(pages, []) == expected
+    back = [ids]
+    while before:
+        ids, _, before = _page(app, before=before)
+        back.append(ids)
+    assert back[::-1] == pages
+
+
+def test_list_order_is_served_by_index(app):
+    with app.app_context():
+        query = Exam.query.add_columns(*[expr for expr, _ in ORDER]).order_by(
+            *[expr.desc() if desc else expr for expr, desc in ORDER]
+        ).limit(5)
+        sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")))
+        assert "ix_exam_list_order" in plan
+        assert "TEMP B-TREE" not in plan
@@ -0,0 +1,82 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models import FeeLedger, FeePayment, FeeStructure, SchoolClass, Student
+from app.services.fees import OverpaymentError, record_payment, verify_fee_ledger
+
+PAID_ON = date(2024, 5, 1)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(SchoolClass(name="Class 1"))
+        db.session.flush()
+        db.session.add_all([
+            Student(admission_no="S1", first_name="A", last_name="B", class_id=1),
+            FeeStructure(class_id=1, fee_type="tuition", amount=Decimal("100.10")),
+        ])
+        db.session.commit()
+    return app
+
+
+def _balance():
+    return Decimal(db.session.query(FeeLedger.balance).scalar()).quantize(Decimal("0.01"))
+
+
+def test_payment_over_balance_by_a_cent_is_rejected(app):
+    with app.app_context():
+        fee_structure = db.session.get(FeeStructure, 1)
+        # 0.1 + 0.2 style amounts: float drift must not let either check slip
+        for amount in ("0.10", "0.20", "40.70"):
+            record_payment(1, fee_structure, Decimal(amount), PAID_ON)
+        db.session.commit()
+        assert _balance() == Decimal("59.10")
+        with pytest.raises(OverpaymentError) as exc:
+            record_payment(1, fee_structure, Decimal("59.11"), PAID_ON)
+        db.session.rollback()
+        assert Decimal(exc.value.balance).quantize(Decimal("0.01")) == Decimal("59.10")
+        record_payment(1, fee_structure, Decimal("59.10"), PAID_ON)
+        db.session.commit()
+        assert _balance() == 0
+        assert verify_fee_ledger() == []
+
+
+def test_payment_view_rejects_overpayment(app, admin_client):
+    client = admin_client(app)
+    data = {"student_id": 1, "fee_structure_id": 1, "payment_date": PAID_ON.isoformat()}
+    response = client.post("/fees/payments/new", data={**data, "amount_paid": "100.11"})
+    assert response.status_code == 200
+    assert b"Overpayment not allowed" in response.data
+    response = client.post("/fees/payments/new", data={**data, "amount_paid": "100.10"})
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.query(FeePayment).count() == 1
+        assert _balance() == 0
+
+
+def test_reconcile_reports_and_repairs_drift(app):
+    with app.app_context():
+        record_payment(1, db.session.get(FeeStructure, 1), Decimal("30.00"), PAID_ON)
+        db.session.commit()
+        db.session.execute(update(FeeLedger).values(amount_paid=Decimal("31.00"), balance=Decimal("69.10")))
+        db.session.commit()
+        assert verify_fee_ledger() == [
+            ((1, 1), (Decimal("100.10"), Decimal("31.00"), Decimal("69.10")),
+             (Decimal("100.10"), Decimal("30.00"), Decimal("70.10"))),
+        ]
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["fees", "reconcile", "--check"])
+    assert result.exit_code == 1
+    assert "1 drifted row(s)." in result.output
+    result = runner.invoke(args=["fees", "reconcile"])
+    assert result.exit_code == 0
+    assert "Fee ledger rebuilt: 1 rows." in result.output
+    with app.app_context():
+        assert verify_fee_ledger() == []
+        assert _balance() == Decimal("70.10")
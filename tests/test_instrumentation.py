@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.instrumentation import _current
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SQL_INSTRUMENTATION=True)
+
+
+def test_failed_statements_leave_nothing_on_the_connection(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        conn = db.session.connection()
+        info = dict(conn.info)
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.session.execute(db.text("SELECT * FROM no_such_table"))
+            db.session.rollback()
+            conn = db.session.connection()
+        assert dict(conn.info) == info
+        db.session.execute(db.text("SELECT 1"))
+        stats = _current.get()
+        assert stats.queries == 1
+        assert 0 <= stats.slowest < 1
+
+
+def test_server_timing_header(app, admin_client):
+    response = admin_client(app).get("/students/")
+    assert response.status_code == 200
+    assert 'db;dur=' in response.headers["Server-Timing"]
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Exam, ExamResult, SchoolClass, Student, Subject
+from app.utils.query_budget import QueryBudgetExceeded, assert_max_queries
+
+STUDENTS = 30
+EXAMS = 4
+
+
+def _seed(app):
+    with app.app_context():
+        school_class = SchoolClass(name="Class 10", academic_year="2024-2025")
+        subjects = [Subject(name=f"Subject {i}", code=f"S{i}") for i in range(EXAMS)]
+        db.session.add_all([school_class, *subjects])
+        db.session.flush()
+        students = [
+            Student(admission_no=f"A{i:03d}", first_name="Student", last_name=str(i), dob=date(2010, 1, 1), class_id=school_class.id)
+            for i in range(STUDENTS)
+        ]
+        exams = [
+            Exam(name=f"Exam {i}", class_id=school_class.id, subject_id=s.id, max_marks=100, exam_date=date(2024, 9, i + 1))
+            for i, s in enumerate(subjects)
+        ]
+        db.session.add_all(students + exams)
+        db.session.flush()
+        db.session.add_all([
+            ExamResult(exam_id=e.id, student_id=s.id, marks_obtained=(i * 7 + j * 3) % 100, grade="B")
+            for i, s in enumerate(students) for j, e in enumerate(exams)
+        ])
+        db.session.commit()
+        return {"exam_id": exams[0].id, "student_id": students[0].id, "class_id": school_class.id}
+
+
+def _budget_urls(ids):
+    return [
+        f"/exams/{ids['exam_id']}",
+        f"/students/{ids['student_id']}/performance",
+        "/reports/exam-performance",
+        f"/reports/exam-performance?class_id={ids['class_id']}",
+        f"/reports/exam-performance?exam_id={ids['exam_id']}",
+    ]
+
+
+@pytest.mark.parametrize("replica", ["", "readonly"])
+def test_views_stay_within_query_budget(make_app, admin_client, replica):
+    # Uncached report results, so the views hit the database every time
+    app = make_app(QUERY_BUDGETS_ENFORCED=True, REPORT_CACHE_SIZE=0, READ_REPLICA=replica)
+    ids = _seed(app)
+    client = admin_client(app)
+    for url in _budget_urls(ids):
+        response = client.get(url)
+        assert response.status_code == 200, url
+
+
+def test_query_budget_counts_replica_queries(make_app):
+    app = make_app(READ_REPLICA="readonly")
+    _seed(app)
+    with app.app_context():
+        replica = db.engines["replica"]
+        with pytest.raises(QueryBudgetExceeded):
+            with assert_max_queries(0):
+                with replica.connect() as conn:
+                    conn.exec_driver_sql("SELECT count(*) FROM student")
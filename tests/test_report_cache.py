@@ -0,0 +1,62 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models import FeeStructure, SchoolClass, Student
+from app.services.reports import fees_collected_report, report_cache
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([SchoolClass(name="Class 1"), SchoolClass(name="Class 2")])
+        db.session.flush()
+        db.session.add_all([
+            Student(admission_no="S1", first_name="A", last_name="B", class_id=1),
+            FeeStructure(class_id=1, fee_type="tuition", amount=Decimal("100.00")),
+        ])
+        db.session.commit()
+    report_cache.clear()
+    return app
+
+
+def _class_1(app):
+    with app.app_context():
+        rows, total = fees_collected_report()
+        return rows[0], total
+
+
+def test_cached_report_is_reused_until_a_write(app):
+    before = _class_1(app)
+    hits = report_cache.stats()["hits"]
+    assert _class_1(app) == before
+    assert report_cache.stats()["hits"] == hits + 1
+    # A rolled-back write leaves the cached entry valid
+    with app.app_context():
+        db.session.add(Student(admission_no="S2", first_name="C", last_name="D", class_id=1))
+        db.session.flush()
+        db.session.rollback()
+    assert _class_1(app) == before
+    assert report_cache.stats()["hits"] == hits + 2
+
+
+def test_cached_report_changes_after_payment(app, admin_client):
+    assert _class_1(app) == ({"class": "Class 1", "collected": 0, "expected": Decimal("100.00")}, 0)
+    response = admin_client(app).post("/fees/payments/new", data={
+        "student_id": 1, "fee_structure_id": 1, "amount_paid": "40.00", "payment_date": date(2024, 5, 1).isoformat(),
+    })
+    assert response.status_code == 302
+    row, total = _class_1(app)
+    assert (row["collected"], total) == (Decimal("40.00"), Decimal("40.00"))
+
+
+def test_cached_report_changes_after_core_update(app):
+    assert _class_1(app)[0]["expected"] == Decimal("100.00")
+    with app.app_context():
+        db.session.execute(update(Student).values(class_id=2))
+        db.session.commit()
+    assert _class_1(app)[0]["expected"] == 0
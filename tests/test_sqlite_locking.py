@@ -0,0 +1,108 @@
+import io
+import sqlite3
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Exam, SchoolClass, Student, Subject
+from app.utils.password_pool import password_pool
+
+# WAL as in production, but a short wait so a held lock fails the test quickly
+PRAGMAS = {"journal_mode": "WAL", "busy_timeout": 50}
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SQLITE_PRAGMAS=PRAGMAS, SQLITE_IMMEDIATE_WRITES=True)
+
+
+@pytest.fixture
+def can_write(tmp_path):
+    """Whether a second connection can take the write lock right now."""
+    def check():
+        conn = sqlite3.connect(tmp_path / "school.db", timeout=0.05, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+            return True
+        except sqlite3.OperationalError:
+            return False
+        finally:
+            conn.close()
+    return check
+
+
+def test_writing_request_holds_write_lock(app, can_write):
+    # The behaviour the views below must work around
+    with app.test_request_context("/students/attendance", method="POST"):
+        db.session.query(Student.id).all()
+        assert not can_write()
+        db.session.rollback()
+        assert can_write()
+
+
+def test_login_does_not_hold_write_lock_while_hashing(app, can_write, monkeypatch):
+    with app.app_context():
+        pool = password_pool()
+    verify = pool.verify
+    seen = []
+
+    def checked_verify(password_hash, password):
+        seen.append(can_write())
+        return verify(password_hash, password)
+
+    monkeypatch.setattr(pool, "verify", checked_verify)
+    response = app.test_client().post("/auth/login", data={"username": "admin", "password": "admin123"})
+    assert response.status_code == 302
+    assert seen == [True]
+
+
+def test_result_upload_does_not_hold_write_lock_while_parsing(app, admin_client, can_write, monkeypatch):
+    with app.app_context():
+        school_class = SchoolClass(name="Class 9")
+        subject = Subject(name="Maths", code="M")
+        db.session.add_all([school_class, subject])
+        db.session.flush()
+        exam = Exam(name="Term 1", class_id=school_class.id, subject_id=subject.id, max_marks=100)
+        db.session.add_all([exam, Student(admission_no="A1", first_name="A", last_name="B", dob=date(2010, 1, 1), class_id=school_class.id)])
+        db.session.commit()
+        exam_id = exam.id
+    from app.services import exam_results
+    parse = exam_results.parse_result
+    seen = []
+
+    def checked_parse(*args):
+        seen.append(can_write())
+        return parse(*args)
+
+    monkeypatch.setattr(exam_results, "parse_result", checked_parse)
+    response = admin_client(app).post(
+        f"/exams/{exam_id}/results/upload",
+        data={"results_file": (io.BytesIO(b"admission_no,marks\nA1,75\n"), "marks.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    assert seen == [True]
+
+
+def test_student_import_does_not_hold_write_lock_while_parsing(app, admin_client, can_write, monkeypatch):
+    from app.services import student_import
+    row_values = student_import._row_values
+    seen = []
+
+    def checked_row_values(data):
+        seen.append(can_write())
+        return row_values(data)
+
+    monkeypatch.setattr(student_import, "_row_values", checked_row_values)
+    csv = b"admission_no,first_name,last_name,dob\nI1,A,B,2010-01-01\nI2,C,D,2010-01-01\n"
+    response = admin_client(app).post(
+        "/students/import",
+        data={"csv_file": (io.BytesIO(csv), "students.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    assert seen == [True, True]
+    with app.app_context():
+        assert db.session.query(Student).filter(Student.admission_no.in_(["I1", "I2"])).count() == 2